@@ -0,0 +1,410 @@
+"""
+End-to-end benchmark of the recipe pipelines against the local mock APIs.
+
+Starts mock_api.MockAPI and runs each pipeline in its own process, so apps
+with clashing module names (src, image_store, RecipeWizard...) do not meet.
+Each worker imports the app from its directory with the base URLs pointing at
+the mock, times the app's own functions as stages, and calls the entry point:
+
+    vijai   web-app/Vijai                 generate_full_output_with_template, then generate_image
+    maka    notebooks/mahendhran-kannan   llm_init
+    raja    notebooks/raja                getRecipe
+    jothi   notebooks/jothi-thondiraj     generate_recipe_and_image
+    blake   notebooks/blake-lawall        process_ingredients
+
+Every request sends different ingredients and the mock numbers its dish
+names, so the response caches and image stores never serve a request (they
+are also pointed at a temporary directory). Client-side rate limits are
+raised far above the request rate: the suite measures the pipelines, not
+the pacing.
+
+Results are printed as one line per pipeline and stage, in a fixed order:
+p50/p99 in milliseconds (nearest rank). A stage ending in ".first" is the time
+to the first token or the first update of a streamed stage. --json writes the
+same numbers as a sorted JSON document; --compare prints the change against
+an earlier one.
+
+Usage:
+    python bench_pipelines.py --requests 20 --users 2 --latency 0.3 --token-rate 50 --image-latency 1.0
+    python bench_pipelines.py --pipelines vijai,blake --error-rate 0.1 --error-status 503
+    python bench_pipelines.py --json after.json --compare before.json
+"""
+import argparse
+import functools
+import inspect
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_api import MockAPI
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PIPELINE_DIRS = {
+    "vijai": "web-app/Vijai",
+    "maka": "notebooks/mahendhran-kannan",
+    "raja": "notebooks/raja",
+    "jothi": "notebooks/jothi-thondiraj",
+    "blake": "notebooks/blake-lawall",
+}
+
+# Completion text per pipeline, in the format each app parses; "{n}" is the request number
+COMPLETIONS = {
+    "vijai": json.dumps({
+        "recipe_details": {
+            "title": "Lemon Chicken Rice Bowl {n}",
+            "ingredients": ["2 chicken breasts", "1 cup rice", "2 tomatoes", "1 onion", "1 tsp paprika"],
+            "instructions": ["Cook the rice.", "Sear the chicken.", "Add the tomatoes and onion.", "Serve over the rice."],
+        },
+        "image_prompt": "A rice bowl topped with golden chicken and roasted tomatoes, dish {n}",
+        "ingredient_suggestions": ["Fresh parsley", "Lemon zest"],
+        "nutrition_info": {"calories": "520 kcal", "protein": "38 g", "carbohydrates": "55 g", "fats": "14 g"},
+    }, indent=2),
+    "maka": (
+        "Title: Spiced Chicken Pilaf {n}\n\n"
+        "Ingredients:\n- 2 chicken thighs\n- 1 cup rice\n- 2 tomatoes\n- 1 onion\n- 1 tsp cumin\n\n"
+        "Instructions:\n1. Brown the chicken.\n2. Soften the onion.\n3. Add rice, tomatoes and water.\n4. Simmer for 20 minutes.\n\n"
+        "Summary: A golden pilaf studded with chicken and tomato, dish {n}."
+    ),
+    "raja": "```json\n" + json.dumps({
+        "dishName": "Tomato Chicken Curry {n}",
+        "ingredients": ["2 chicken breasts", "3 tomatoes", "1 onion", "2 tsp curry powder"],
+        "cookingInstructions": "Fry the onion, add the spices and tomatoes, then simmer the chicken for 25 minutes.",
+    }, indent=2) + "\n```",
+    "jothi": (
+        "Title: Tomato Chicken Fried Rice {n}\n\n"
+        "Ingredients:\n- 1 cup cooked rice\n- 1 chicken breast\n- 2 tomatoes\n- 1 onion\n\n"
+        "Instructions:\n1. Fry the onion and chicken.\n2. Add the tomatoes.\n3. Stir in the rice and season."
+    ),
+    "blake": "Here is a recipe:\n```json\n" + json.dumps({
+        "name": "Chicken and Rice Skillet {n}",
+        "ingredients": ["2 chicken breasts", "1 cup rice", "2 tomatoes", "1 onion"],
+        "instructions": ["Brown the chicken.", "Add the rice and tomatoes.", "Cover and cook for 20 minutes."],
+        "cooking_time": 35,
+        "difficulty": "Easy",
+    }, indent=2) + "\n```",
+}
+
+
+def ingredients(index):
+    return f"chicken, rice, tomatoes, onions, spices, request {index}"
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+# Worker side: runs inside the app's directory
+
+
+class StageTimer:
+    """
+    Records wall-clock samples per stage from any thread.
+
+    wrap() replaces a function or method on its module or class with a timed
+    version. Generator functions are timed until they are exhausted, and the
+    time to their first item is recorded as "<stage>.first".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def register(self, stage, streamed=False):
+        # Fixes the reporting order
+        with self._lock:
+            self.samples.setdefault(stage, [])
+            if streamed:
+                self.samples.setdefault(f"{stage}.first", [])
+
+    def timed(self, stage, fn):
+        streamed = inspect.isgeneratorfunction(fn)
+        self.register(stage, streamed)
+        timer = self
+
+        if streamed:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                first = True
+                for item in fn(*args, **kwargs):
+                    if first:
+                        timer.record(f"{stage}.first", time.perf_counter() - start)
+                        first = False
+                    yield item
+                timer.record(stage, time.perf_counter() - start)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = fn(*args, **kwargs)
+                timer.record(stage, time.perf_counter() - start)
+                return result
+        return wrapper
+
+    def wrap(self, owner, name, stage):
+        setattr(owner, name, self.timed(stage, getattr(owner, name)))
+
+
+def provide_secrets():
+    # mahendhran-kannan reads its keys from config/secrets.py, which is kept
+    # out of the repository; give it the mock's keys when it is absent
+    try:
+        import config.secrets  # noqa: F401
+    except ImportError:
+        secrets = types.ModuleType("config.secrets")
+        secrets.OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
+        secrets.MK_HF_API_KEY = os.environ["OPENAI_API_KEY"]
+        config = types.ModuleType("config")
+        config.secrets = secrets
+        sys.modules.update({"config": config, "config.secrets": secrets})
+
+
+def vijai(timer):
+    import image_creator
+    import recipe_generator
+
+    timer.wrap(recipe_generator, "generate_full_output_with_template", "recipe")
+    timer.wrap(recipe_generator, "build_output", "parse")
+    timer.wrap(image_creator, "generate_image", "image")
+
+    def request(index):
+        output = recipe_generator.generate_full_output_with_template({
+            "ingredients": ingredients(index),
+            "dietary_restrictions": "none",
+            "cuisine_preferences": "Mediterranean",
+            "time_constraints": "30 minutes",
+        }, use_cache=False)
+        if not isinstance(output["recipe_details"], dict):
+            raise RuntimeError(output["recipe_details"])
+        image_creator.generate_image(output["image_prompt"])
+    return request
+
+
+def maka(timer):
+    provide_secrets()
+    from src import llm_model
+
+    timer.wrap(llm_model.llm_router, "complete", "llm")
+    timer.wrap(llm_model, "parse_sections", "parse")
+    timer.wrap(llm_model, "generate_image", "image")
+    return lambda index: llm_model.llm_init("gpt-4o-mini", ingredients(index))
+
+
+def raja(timer):
+    from src import RecipeWizard
+
+    timer.wrap(RecipeWizard.LLMChain, "run", "llm")
+    timer.wrap(RecipeWizard, "parse_json_markdown", "parse")
+    timer.wrap(RecipeWizard, "getRecipeImage", "image")
+    timer.wrap(RecipeWizard, "convert_to_md", "render")
+    key = os.environ["OPENAI_API_KEY"]
+    return lambda index: RecipeWizard.getRecipe(ingredients(index), [], "gpt-4o-mini", key, "dall-e-3", key)
+
+
+def jothi(timer):
+    import app
+
+    timer.wrap(app, "generate_recipe_stream", "recipe")
+    timer.wrap(app, "generate_image", "image")
+
+    def request(index):
+        recipe_text, recipe_image = app.generate_recipe_and_image(ingredients(index), [])
+        if recipe_image.value is None:
+            raise RuntimeError(recipe_text)
+    return request
+
+
+def blake(timer):
+    import app
+
+    timer.wrap(app.RecipeGenerator, "generate_recipe_stream", "recipe")
+    timer.wrap(app.RecipeGenerator, "generate_image", "image")
+
+    def request(index):
+        yield from app.process_ingredients(ingredients(index))
+    return request
+
+
+PIPELINES = {"vijai": vijai, "maka": maka, "raja": raja, "jothi": jothi, "blake": blake}
+
+
+def run_worker(args):
+    sys.path.insert(0, os.getcwd())
+    timer = StageTimer()
+    total = timer.timed("total", PIPELINES[args.worker](timer))
+
+    errors = {}
+    errors_lock = threading.Lock()
+
+    def run(index):
+        try:
+            result = total(index)
+            if inspect.isgenerator(result):
+                for _ in result:
+                    pass
+        except Exception as e:
+            with errors_lock:
+                name = type(e).__name__
+                errors[name] = errors.get(name, 0) + 1
+
+    # Warm-up requests load lazy imports and open connections; they are not reported
+    for index in range(args.warmup):
+        run(-1 - index)
+    timer.samples = {stage: [] for stage in timer.samples}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(run, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    with open(args.result_file, "w") as result_file:
+        json.dump({"samples": timer.samples, "errors": errors, "wall": wall}, result_file)
+
+
+# Parent side
+
+
+def summarize(result, requests):
+    stages = {}
+    # End to end first, then the stages in the order the worker wrapped them
+    order = sorted(result["samples"], key=lambda stage: stage.split(".")[0] != "total")
+    for stage in order:
+        samples = result["samples"][stage]
+        if not samples:
+            continue
+        stages[stage] = {
+            "n": len(samples),
+            "p50_ms": round(statistics.median(samples) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        }
+    return {
+        "stages": stages,
+        "errors": result["errors"],
+        "throughput_rps": round(requests / result["wall"], 2),
+    }
+
+
+def run_pipeline(name, mock, args, scratch):
+    url = f"{mock.url}/{name}"
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="mock",
+        OPENAI_BASE_URL=f"{url}/openai/v1",
+        MK_OPENAI_BASE_URL=f"{url}/openai/v1",
+        MK_HF_BASE_URL=f"{url}/hf",
+        RECIPE_HF_BASE_URL=f"{url}/hf",
+        API_Token_HF_AIrecipe="mock",
+        BEDROCK_ENDPOINT_URL=f"{url}/bedrock",
+        AWS_ACCESS_KEY_ID="mock",
+        AWS_SECRET_ACCESS_KEY="mock",
+        AWS_DEFAULT_REGION="us-east-1",
+        RECIPE_CACHE_PATH=os.path.join(scratch, f"{name}_cache.sqlite3"),
+        RECIPE_IMAGE_STORE_DIR=os.path.join(scratch, f"{name}_images"),
+        MK_IMAGE_STORE_DIR=os.path.join(scratch, f"{name}_images"),
+        RECIPE_TRACE_PATH=os.path.join(scratch, f"{name}_traces.jsonl"),
+        RECIPE_OPENAI_RPM="100000", RECIPE_OPENAI_TPM="100000000", RECIPE_GPT4_TPM="100000000", RECIPE_DALLE_RPM="100000",
+        MK_OPENAI_RPM="100000", MK_OPENAI_TPM="100000000", MK_HF_RPM="100000", MK_HF_TPM="100000000", MK_DALLE_RPM="100000",
+        RECIPE_CONCURRENCY=str(args.users),
+        PYTHONUNBUFFERED="1",
+    )
+    result_file = os.path.join(scratch, f"{name}.json")
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", name, "--result-file", result_file,
+        "--requests", str(args.requests), "--users", str(args.users), "--warmup", str(args.warmup),
+    ]
+    # The apps print their responses; keep that out of the report
+    process = subprocess.run(command, cwd=os.path.join(REPO_ROOT, PIPELINE_DIRS[name]), env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if process.returncode != 0:
+        print(process.stdout[-3000:], file=sys.stderr)
+        raise SystemExit(f"{name} worker failed with exit code {process.returncode}")
+    with open(result_file) as f:
+        return summarize(json.load(f), args.requests)
+
+
+def print_report(report):
+    print(f"{'pipeline':<8} {'stage':<14} {'n':>5} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, result in report["pipelines"].items():
+        for stage, stats in result["stages"].items():
+            print(f"{name:<8} {stage:<14} {stats['n']:>5} {stats['p50_ms']:>10.1f} {stats['p99_ms']:>10.1f}")
+        errors = ", ".join(f"{kind} {count}" for kind, count in sorted(result["errors"].items())) or "none"
+        print(f"{name:<8} {'throughput':<14} {result['throughput_rps']:>5} req/s | failed requests: {errors}")
+    print(f"mock calls: {json.dumps(report['mock']['calls'])}")
+    print(f"mock injected errors: {json.dumps(report['mock']['errors'])}")
+
+
+def print_comparison(report, baseline):
+    print("\nchange against the baseline (p50, p99)")
+    for name, result in report["pipelines"].items():
+        for stage, stats in result["stages"].items():
+            before = baseline.get("pipelines", {}).get(name, {}).get("stages", {}).get(stage)
+            if not before:
+                continue
+            deltas = [
+                f"{key[:3]} {before[key]:.1f} -> {stats[key]:.1f} ms ({(stats[key] - before[key]) / before[key] * 100 if before[key] else 0:+.1f}%)"
+                for key in ("p50_ms", "p99_ms")
+            ]
+            print(f"{name:<8} {stage:<14} {' | '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipelines", default=",".join(PIPELINES), help="comma-separated subset of " + ",".join(PIPELINES))
+    parser.add_argument("--requests", type=int, default=20, help="measured requests per pipeline")
+    parser.add_argument("--users", type=int, default=1, help="concurrent requests")
+    parser.add_argument("--warmup", type=int, default=1, help="unreported requests before measuring")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte of a model response")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="completion tokens per second (0 = no delay)")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="seconds per image")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock calls that fail")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected failures")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the error injection")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    parser.add_argument("--worker", choices=list(PIPELINES), help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    mock = MockAPI(
+        completions=COMPLETIONS, latency=args.latency, token_rate=args.token_rate, image_latency=args.image_latency,
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+    ).start()
+    report = {
+        "config": {key: getattr(args, key) for key in (
+            "requests", "users", "warmup", "latency", "token_rate", "image_latency", "error_rate", "error_status", "seed")},
+        "pipelines": {},
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in args.pipelines.split(","):
+            report["pipelines"][name] = run_pipeline(name.strip(), mock, args, scratch)
+    report["mock"] = mock.stats()
+    mock.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Local stand-in for the model APIs the recipe apps call.
+
+One HTTP server speaks enough of each API for the apps to run unchanged:
+
+    /<scenario>/openai/v1/chat/completions          OpenAI chat (plain or streamed)
+    /<scenario>/openai/v1/images/generations        OpenAI images (url or b64_json)
+    /<scenario>/hf/v1/chat/completions              HF Inference chat (OpenAI format)
+    /<scenario>/hf/models/<model>                   HF text-generation (plain or streamed),
+                                                    or text-to-image when the client asks for image/png
+    /<scenario>/bedrock/model/<id>/invoke           Bedrock InvokeModel (Claude v2 or Stable Diffusion)
+    /<scenario>/bedrock/model/<id>/invoke-with-response-stream
+                                                    Bedrock streaming, in the AWS event-stream encoding
+
+The scenario is the first path segment. It picks the completion text, so every
+app gets a reply in the format its parser expects. "{n}" in a completion is
+replaced with a per-scenario request number, which keeps dish names (and so
+the apps' image caches) distinct from one request to the next.
+
+Each model call waits `latency` seconds before the first byte, then sends the
+completion at `token_rate` tokens per second: streamed responses send one
+token at a time, other responses wait for the whole completion. Image calls
+take `image_latency` seconds. A fraction `error_rate` of calls fail with
+`error_status` in the provider's own error format.
+
+Usage:
+    python mock_api.py --port 8000 --latency 0.3 --token-rate 50 --error-rate 0.05
+"""
+import argparse
+import base64
+import binascii
+import io
+import json
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from PIL import Image
+
+DEFAULT_COMPLETION = "Title: Stub Dish {n}\n\nIngredients:\n- 1 cup rice\n\nInstructions:\n1. Cook the rice.\n\nSummary: A bowl of rice."
+
+TOKEN_PATTERN = re.compile(r"\s*\S+|\s+")
+
+
+def tokenize(text):
+    # Whitespace-delimited pieces, close enough to BPE tokens for pacing
+    return TOKEN_PATTERN.findall(text)
+
+
+def event_stream_message(payload, headers):
+    # One message of the AWS event-stream encoding: prelude, string headers,
+    # payload, with CRC32 checksums over the prelude and the whole message
+    encoded_headers = b""
+    for name, value in headers.items():
+        name, value = name.encode(), value.encode()
+        encoded_headers += struct.pack("!B", len(name)) + name + struct.pack("!BH", 7, len(value)) + value
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack("!II", total_length, len(encoded_headers))
+    message = prelude + struct.pack("!I", binascii.crc32(prelude)) + encoded_headers + payload
+    return message + struct.pack("!I", binascii.crc32(message))
+
+
+class MockAPI:
+    """
+    Threaded mock of the OpenAI, HF Inference and Bedrock APIs.
+
+    Args:
+        completions (dict): scenario -> completion text returned by every chat
+            and text-generation call in that scenario.
+        latency (float): Seconds before the first byte of a model response.
+        token_rate (float): Completion tokens per second (0 sends them at once).
+        image_latency (float): Seconds per generated image.
+        error_rate (float): Fraction of calls that fail.
+        error_status (int): HTTP status of the injected failures (429 or 5xx).
+        seed (int): Seed for the error injection, so runs fail the same calls.
+    """
+
+    def __init__(self, completions=None, latency=0.0, token_rate=0.0, image_latency=0.0,
+                 error_rate=0.0, error_status=429, seed=0, port=0):
+        self.completions = completions or {}
+        self.latency = latency
+        self.token_rate = token_rate
+        self.image_latency = image_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._numbers = {}
+        self.calls = {}
+        self.errors = {}
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), (200, 160, 90)).save(buffer, format="PNG")
+        self.image = buffer.getvalue()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(sorted(self.calls.items())), "errors": dict(sorted(self.errors.items()))}
+
+    def completion(self, scenario):
+        with self._lock:
+            number = self._numbers.get(scenario, 0) + 1
+            self._numbers[scenario] = number
+        return self.completions.get(scenario, DEFAULT_COMPLETION).replace("{n}", str(number))
+
+    def _count(self, api):
+        # Returns True when this call should fail
+        with self._lock:
+            self.calls[api] = self.calls.get(api, 0) + 1
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.errors[api] = self.errors.get(api, 0) + 1
+            return failed
+
+    def token_delay(self, tokens=1):
+        return tokens / self.token_rate if self.token_rate > 0 else 0.0
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive like the real APIs; headers and body go out in
+            # separate writes, so Nagle would add delayed-ACK stalls
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                # Image URLs handed out by the OpenAI images route
+                if self.path.endswith(".png"):
+                    self.send_body(200, mock.image, "image/png")
+                else:
+                    self.send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.loads(raw) if raw else {}
+                parts = self.path.split("?")[0].strip("/").split("/")
+                scenario, provider, route = parts[0], parts[1], "/".join(parts[2:])
+                if provider == "openai":
+                    self.openai(scenario, route, body)
+                elif provider == "hf":
+                    self.huggingface(scenario, route, body)
+                elif provider == "bedrock":
+                    self.bedrock(scenario, unquote(route), body)
+                else:
+                    self.send_json(404, {"error": {"message": f"unknown provider {provider}"}})
+
+            # OpenAI and HF chat completions
+
+            def openai(self, scenario, route, body):
+                if route.endswith("images/generations"):
+                    if mock._count("openai.images"):
+                        return self.openai_error()
+                    time.sleep(mock.image_latency)
+                    if body.get("response_format") == "b64_json":
+                        item = {"b64_json": base64.b64encode(mock.image).decode()}
+                    else:
+                        item = {"url": f"{mock.url}/{scenario}/files/image.png"}
+                    item["revised_prompt"] = body.get("prompt")
+                    data = [dict(item) for _ in range(body.get("n", 1))]
+                    return self.send_json(200, {"created": int(time.time()), "data": data})
+                if mock._count("openai.chat"):
+                    return self.openai_error()
+                self.chat(scenario, body)
+
+            def openai_error(self):
+                status = mock.error_status
+                kind = "rate_limit_exceeded" if status == 429 else "server_error"
+                self.send_json(status, {"error": {"message": f"injected {status}", "type": kind, "code": kind}})
+
+            def chat(self, scenario, body):
+                text = mock.completion(scenario)
+                tokens = tokenize(text)
+                base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body.get("model", "mock")}
+                time.sleep(mock.latency)
+                usage = {"prompt_tokens": 50, "completion_tokens": len(tokens), "total_tokens": 50 + len(tokens)}
+                if not body.get("stream"):
+                    time.sleep(mock.token_delay(len(tokens)))
+                    message = {"role": "assistant", "content": text}
+                    return self.send_json(200, dict(base, object="chat.completion", usage=usage, choices=[
+                        {"index": 0, "message": message, "finish_reason": "stop"}]))
+                self.start_stream("text/event-stream")
+                for token in tokens:
+                    self.send_chunk(self.sse(dict(base, object="chat.completion.chunk", choices=[
+                        {"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}])))
+                    time.sleep(mock.token_delay())
+                self.send_chunk(self.sse(dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {}, "finish_reason": "stop"}])))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self.send_chunk(self.sse(dict(base, object="chat.completion.chunk", choices=[], usage=usage)))
+                self.send_chunk(b"data: [DONE]\n\n")
+                self.end_stream()
+
+            # HF Inference API
+
+            def huggingface(self, scenario, route, body):
+                if route.endswith("chat/completions"):
+                    if mock._count("hf.chat"):
+                        return self.hf_error()
+                    return self.chat(scenario, body)
+                if "image/" in self.headers.get("Accept", ""):
+                    if mock._count("hf.text_to_image"):
+                        return self.hf_error()
+                    time.sleep(mock.image_latency)
+                    return self.send_body(200, mock.image, "image/png")
+                if mock._count("hf.text_generation"):
+                    return self.hf_error()
+                text = mock.completion(scenario)
+                tokens = tokenize(text)
+                time.sleep(mock.latency)
+                if not body.get("stream"):
+                    time.sleep(mock.token_delay(len(tokens)))
+                    return self.send_json(200, [{"generated_text": text}])
+                self.start_stream("text/event-stream")
+                for index, token in enumerate(tokens):
+                    last = index == len(tokens) - 1
+                    self.send_chunk(self.sse({
+                        "index": index,
+                        "token": {"id": index, "text": token, "logprob": 0.0, "special": False},
+                        "generated_text": text if last else None,
+                        "details": None,
+                    }))
+                    time.sleep(mock.token_delay())
+                self.end_stream()
+
+            def hf_error(self):
+                self.send_json(mock.error_status, {"error": f"injected {mock.error_status}"})
+
+            # Bedrock runtime
+
+            def bedrock(self, scenario, route, body):
+                model_id = route.split("/")[1] if route.startswith("model/") else ""
+                if model_id.startswith("stability."):
+                    if mock._count("bedrock.image"):
+                        return self.bedrock_error()
+                    time.sleep(mock.image_latency)
+                    artifact = {"base64": base64.b64encode(mock.image).decode(), "seed": body.get("seed", 0), "finishReason": "SUCCESS"}
+                    return self.send_json(200, {"result": "success", "artifacts": [artifact]})
+                if not model_id.startswith("anthropic."):
+                    # Bedrock rejects an unknown model id before any inference
+                    return self.send_json(400, {"message": f"The provided model identifier is invalid: {model_id}"},
+                                          {"x-amzn-ErrorType": "ValidationException"})
+                if mock._count("bedrock.claude"):
+                    return self.bedrock_error()
+                text = mock.completion(scenario)
+                tokens = tokenize(text)
+                time.sleep(mock.latency)
+                if not route.endswith("invoke-with-response-stream"):
+                    time.sleep(mock.token_delay(len(tokens)))
+                    return self.send_json(200, {"completion": text, "stop_reason": "stop_sequence"})
+                self.start_stream("application/vnd.amazon.eventstream")
+                for index, token in enumerate(tokens):
+                    last = index == len(tokens) - 1
+                    chunk = json.dumps({"completion": token, "stop_reason": "stop_sequence" if last else None}).encode()
+                    payload = json.dumps({"bytes": base64.b64encode(chunk).decode()}).encode()
+                    self.send_chunk(event_stream_message(payload, {
+                        ":event-type": "chunk",
+                        ":content-type": "application/json",
+                        ":message-type": "event",
+                    }))
+                    time.sleep(mock.token_delay())
+                self.end_stream()
+
+            def bedrock_error(self):
+                kind = "ThrottlingException" if mock.error_status == 429 else "ServiceUnavailableException"
+                self.send_json(mock.error_status, {"message": f"injected {mock.error_status}"}, {"x-amzn-ErrorType": kind})
+
+            # Transport
+
+            def send_body(self, status, data, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_json(self, status, payload, headers=None):
+                self.send_body(status, json.dumps(payload).encode(), "application/json", headers)
+
+            @staticmethod
+            def sse(payload):
+                return f"data: {json.dumps(payload)}\n\n".encode()
+
+            def start_stream(self, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def send_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def end_stream(self):
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte of a model response")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="completion tokens per second (0 = no delay)")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="seconds per image")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-status", type=int, default=429)
+    args = parser.parse_args()
+
+    mock = MockAPI(
+        latency=args.latency, token_rate=args.token_rate, image_latency=args.image_latency,
+        error_rate=args.error_rate, error_status=args.error_status, port=args.port,
+    )
+    print(f"Serving on {mock.url}/<scenario>/{{openai,hf,bedrock}}/...")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(mock.stats()))
+
+
+if __name__ == "__main__":
+    main()
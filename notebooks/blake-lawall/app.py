@@ -2,17 +2,45 @@ import gradio as gr
 import boto3
 import json
 import re
-import random
 import base64
 from PIL import Image
 import io
 import logging
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from bedrock_pool import bedrock_pool, CONCURRENCY
+from stream_parser import IncrementalJSONParser
+from image_store import image_store, image_key
 from IPython.display import Image as IPImage
 from IPython.display import display, HTML
 
+IMAGE_MODEL = 'stability.stable-diffusion-xl-v1'
+IMAGE_SIZE = 640
+
+# Quality tiers rendered for every dish, cheapest first, as "name:steps" pairs.
+# The first tier is shown as a draft until the last (final) one replaces it.
+def parse_image_tiers(spec):
+    tiers = []
+    for item in spec.split(','):
+        name, steps = item.strip().split(':')
+        tiers.append((name, int(steps)))
+    return tiers
+
+IMAGE_TIERS = parse_image_tiers(os.getenv("RECIPE_IMAGE_TIERS", "draft:12,final:50"))
+
+# Each pooled client carries the recipe stream plus one image call per tier
+bedrock_pool.max_pool_connections = len(IMAGE_TIERS) + 1
+
+def recipe_seed(recipe_name):
+    # Same dish, same seed: the draft previews the final render and both are cacheable
+    normalized = ' '.join(str(recipe_name).lower().split())
+    return int(hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:8], 16)
+
 class RecipeGenerator:
-    def __init__(self):
-        self.bedrock = boto3.client('bedrock-runtime')
+    def __init__(self, bedrock=None):
+        # Pass a pooled client to avoid building a new one per request
+        self.bedrock = bedrock or boto3.client('bedrock-runtime')
 
 
     def extract_json(self, response):
@@ -23,10 +51,17 @@ class RecipeGenerator:
         return None
     
     
-    def generate_recipe(self, ingredients):
-        prompt = f"""\nHuman:\n\nCreate a recipe using these ingredients: {', '.join(ingredients)}. 
+    def recipe_prompt(self, ingredients):
+        # The Gradio textbox passes a string; lists are joined
+        if not isinstance(ingredients, str):
+            ingredients = ', '.join(ingredients)
+        return f"""\nHuman:\n\nCreate a recipe using these ingredients: {ingredients}. 
         Format as JSON with fields: name, ingredients (list), instructions (list), cooking_time (minutes), difficulty
         \nAssistant:\n"""
+
+
+    def generate_recipe(self, ingredients):
+        prompt = self.recipe_prompt(ingredients)
         
         response = self.bedrock.invoke_model(
             modelId='anthropic.claude-v2',
@@ -42,51 +77,113 @@ class RecipeGenerator:
         print(recipe)
         return recipe
 
-    def generate_image(self, recipe_name):
+    def generate_recipe_stream(self, ingredients):
+        # Yields the recipe as it is parsed from the streamed completion: name
+        # first, then each ingredient and instruction as soon as it is complete
+        response = self.bedrock.invoke_model_with_response_stream(
+            modelId='anthropic.claude-v2',
+            body=json.dumps({
+                "prompt": self.recipe_prompt(ingredients),
+                "max_tokens_to_sample": 500,
+                "temperature": 0.7
+            })
+        )
+
+        parser = IncrementalJSONParser()
+        recipe = {}
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if not chunk or parser.done:
+                continue
+            completion = json.loads(chunk['bytes'])['completion']
+            updated = False
+            for path, value in parser.feed(completion):
+                if path == ():
+                    recipe = value
+                elif len(path) == 1 and not isinstance(value, (dict, list)):
+                    recipe[path[0]] = value
+                elif len(path) == 2 and path[0] in ('ingredients', 'instructions'):
+                    recipe.setdefault(path[0], []).append(value)
+                else:
+                    continue
+                updated = True
+            if updated:
+                yield dict(recipe)
+
+        print(recipe)
+
+    def image_prompt(self, recipe_name):
+        return f"A professional food photography shot of {recipe_name}, on a white plate with garnish, studio lighting"
+
+    def image_key(self, recipe_name, steps):
+        size = f"{IMAGE_SIZE}x{IMAGE_SIZE}"
+        return image_key(self.image_prompt(recipe_name), IMAGE_MODEL, size, recipe_seed(recipe_name), steps)
+
+    def generate_image(self, recipe_name, steps=IMAGE_TIERS[-1][1]):
         print(f"{recipe_name}")
-        prompt = f"A professional food photography shot of {recipe_name}, on a white plate with garnish, studio lighting"
+        prompt = self.image_prompt(recipe_name)
         print(prompt)
+
+        # Renders are cached per dish and tier
+        key = self.image_key(recipe_name, steps)
+        image_data = image_store.get(key)
+        if image_data is not None:
+            return Image.open(io.BytesIO(image_data))
         
-        seed = random.randint(0, 4294967295)
+        seed = recipe_seed(recipe_name)
         # client =  boto3.client('bedrock-runtime',region_name="us-west-2")
         
         response = self.bedrock.invoke_model(
-            modelId='stability.stable-diffusion-xl-v1',
+            modelId=IMAGE_MODEL,
             body=json.dumps({
                 "text_prompts": [{"text": prompt}],
                 "style_preset": "photographic",
                 "seed": seed,
-                "height": 640,
-                "width": 640,
+                "height": IMAGE_SIZE,
+                "width": IMAGE_SIZE,
                 "cfg_scale": 7,
-                "steps": 50,
+                "steps": steps,
             })
         )
 
         model_response = json.loads(response["body"].read())
         base64_image_data = model_response["artifacts"][0]["base64"]
         image_data = base64.b64decode(base64_image_data)
+        image_store.put(key, image_data)
         return Image.open(io.BytesIO(image_data))
 
+    def submit_images(self, executor, recipe_name):
+        # One future per tier, rendered in parallel so the final image is not
+        # delayed by the draft; skipped entirely when the final render is cached
+        tiers = IMAGE_TIERS
+        if image_store.get(self.image_key(recipe_name, tiers[-1][1])) is not None:
+            tiers = tiers[-1:]
+        return [executor.submit(self.generate_image, recipe_name, steps) for _, steps in tiers]
+
     def display_recipe(self, recipe, image):
+        # Also renders partial recipes while streaming; missing fields are left out
+        details = ''
+        if 'cooking_time' in recipe:
+            details += f"<p>Cooking Time: {recipe['cooking_time']} minutes</p>"
+        if 'difficulty' in recipe:
+            details += f"<p>Difficulty: {recipe['difficulty']}</p>"
         html = f"""
         <div style='max-width: 800px; margin: 20px auto; font-family: Arial;'>
-            <h1>{recipe['name']}</h1>
+            <h1>{recipe.get('name', '')}</h1>
             <div style='margin: 20px 0;'>
                 <h3>Ingredients:</h3>
                 <ul>
-                    {''.join(f'<li>{ingredient}</li>' for ingredient in recipe['ingredients'])}
+                    {''.join(f'<li>{ingredient}</li>' for ingredient in recipe.get('ingredients', []))}
                 </ul>
             </div>
             <div style='margin: 20px 0;'>
                 <h3>Instructions:</h3>
                 <ol>
-                    {''.join(f'<li>{instruction}</li>' for instruction in recipe['instructions'])}
+                    {''.join(f'<li>{instruction}</li>' for instruction in recipe.get('instructions', []))}
                 </ol>
             </div>
             <div>
-                <p>Cooking Time: {recipe['cooking_time']} minutes</p>
-                <p>Difficulty: {recipe['difficulty']}</p>
+                {details}
             </div>
         </div>
         """
@@ -95,17 +192,57 @@ class RecipeGenerator:
         return [html, image]
 
 
+# Stable Diffusion runs here while the recipe is still streaming
+image_executor = ThreadPoolExecutor(max_workers=CONCURRENCY * len(IMAGE_TIERS))
+
+def best_image(image_futures):
+    # Highest finished tier; failed tiers are skipped
+    for future in reversed(image_futures):
+        if future.done() and future.exception() is None:
+            return future.result()
+    return None
+
 def process_ingredients(Ingredients):
-    generator = RecipeGenerator()
-    recipe = generator.generate_recipe(Ingredients)
-    image = generator.generate_image(recipe['name'])
-    return generator.display_recipe(recipe, image)
+    with bedrock_pool.client() as bedrock:
+        generator = RecipeGenerator(bedrock)
+        recipe = {}
+        image_futures = []
+        for recipe in generator.generate_recipe_stream(Ingredients):
+            # Start the images as soon as the name is known
+            if not image_futures and recipe.get('name'):
+                image_futures = generator.submit_images(image_executor, recipe['name'])
+            yield generator.display_recipe(recipe, best_image(image_futures))
+        if not image_futures:
+            image_futures = generator.submit_images(image_executor, recipe.get('name', Ingredients))
+
+        # Show the draft when it lands, then replace it with the final render
+        final = image_futures[-1]
+        shown = None
+        pending = set(image_futures)
+        while pending and not (final.done() and final.exception() is None):
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            image = best_image(image_futures)
+            if image is not None and image is not shown:
+                shown = image
+                yield generator.display_recipe(recipe, image)
+        for future in image_futures:
+            future.cancel()  # drafts not started yet are no longer needed
+
+        image = best_image(image_futures)
+        if image is None:
+            raise final.exception()
+        if image is not shown:
+            yield generator.display_recipe(recipe, image)
 
 demo = gr.Interface(
     fn=process_ingredients,
     inputs=["textbox"],
     title="Recipe Generator",
-    outputs=["html", "image"]
+    outputs=["html", "image"],
+    concurrency_limit=CONCURRENCY
 )
 
-demo.launch(share=True)
\ No newline at end of file
+if __name__ == "__main__":
+    # Build the Bedrock clients before the first request arrives
+    bedrock_pool.start()
+    demo.launch(share=True)
\ No newline at end of file
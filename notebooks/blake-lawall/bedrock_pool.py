@@ -0,0 +1,86 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import boto3
+from botocore.config import Config
+
+# Gradio runs at most this many process_ingredients calls at once; the pool
+# holds one client per concurrent call
+CONCURRENCY = int(os.getenv("RECIPE_CONCURRENCY", 4))
+
+
+class BedrockClientPool:
+    """
+    Process-wide pool of bedrock-runtime clients, created and warmed once.
+
+    Credentials and config are resolved once in a shared session, and the
+    service model and endpoint are loaded when each client is built. Warming
+    makes no API calls. Every client keeps its own keep-alive connection pool,
+    opened by its first request. Callers borrow a client for one request with
+    `with pool.client() as bedrock:`.
+
+    max_pool_connections is the number of connections one client can hold:
+    the recipe stream plus one image call per quality tier.
+    """
+
+    def __init__(self, size=CONCURRENCY, region_name=None, endpoint_url=None, warm=True, max_pool_connections=4):
+        self.size = size
+        self.max_pool_connections = max_pool_connections
+        self.region_name = region_name or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION")
+        self.endpoint_url = endpoint_url or os.getenv("BEDROCK_ENDPOINT_URL")
+        self.warm = warm
+        self._clients = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self.counters = {"borrowed": 0, "waited": 0, "wait_seconds": 0.0, "startup_seconds": 0.0}
+
+    def start(self):
+        # Clients are built in one thread: a boto3 session is not thread-safe
+        with self._lock:
+            if self._started:
+                return
+            start = time.perf_counter()
+            session = boto3.session.Session(region_name=self.region_name)
+            config = Config(
+                max_pool_connections=self.max_pool_connections,
+                tcp_keepalive=True,
+                retries={"max_attempts": 4, "mode": "adaptive"},
+                read_timeout=120,
+            )
+            if self.warm:
+                # Runs the credential provider chain now rather than on the first request
+                credentials = session.get_credentials()
+                if credentials is not None:
+                    credentials.get_frozen_credentials()
+            for _ in range(self.size):
+                self._clients.put(session.client("bedrock-runtime", endpoint_url=self.endpoint_url, config=config))
+            self.counters["startup_seconds"] = time.perf_counter() - start
+            self._started = True
+
+    @contextmanager
+    def client(self, timeout=None):
+        self.start()
+        start = time.perf_counter()
+        try:
+            bedrock = self._clients.get_nowait()
+        except queue.Empty:
+            bedrock = self._clients.get(timeout=timeout)
+            with self._lock:
+                self.counters["waited"] += 1
+        with self._lock:
+            self.counters["borrowed"] += 1
+            self.counters["wait_seconds"] += time.perf_counter() - start
+        try:
+            yield bedrock
+        finally:
+            self._clients.put(bedrock)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, size=self.size, available=self._clients.qsize())
+
+
+bedrock_pool = BedrockClientPool()
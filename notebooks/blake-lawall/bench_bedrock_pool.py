@@ -0,0 +1,158 @@
+"""
+Startup and latency benchmark for the Bedrock client pool.
+
+A local stub speaks the bedrock-runtime InvokeModel API. It returns a Claude v2
+completion with a fenced JSON recipe and a Stable Diffusion artifact after a
+configurable delay, and counts the TCP connections it accepts. Each simulated
+Gradio request makes the same two invoke_model calls as process_ingredients,
+either with a new boto3 client per request (as before) or with a client
+borrowed from BedrockClientPool.
+
+Usage:
+    python bench_bedrock_pool.py --users 4 --requests 40 --latency 0.05
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+from PIL import Image
+
+from bedrock_pool import BedrockClientPool
+
+RECIPE = {
+    "name": "Egg Salad",
+    "ingredients": ["4 eggs", "2 tbsp mayonnaise", "1 tsp mustard"],
+    "instructions": ["Boil the eggs.", "Chop them.", "Mix everything."],
+    "cooking_time": 15,
+    "difficulty": "Easy",
+}
+
+
+class StubBedrock:
+    # Minimal InvokeModel endpoint: POST /model/<modelId>/invoke
+    def __init__(self, latency):
+        self.latency = latency
+        self.connections = 0
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), (200, 180, 120)).save(buffer, format="PNG")
+        self.image = base64.b64encode(buffer.getvalue()).decode()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, delayed
+            # ACKs add ~40 ms to every call on a reused connection
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                model_id = self.path.split("/")[2]
+                if model_id.startswith("anthropic."):
+                    time.sleep(stub.latency)
+                    status, payload = 200, {"completion": "Here it is:\n```json\n" + json.dumps(RECIPE) + "\n```"}
+                elif model_id.startswith("stability."):
+                    time.sleep(stub.latency)
+                    status, payload = 200, {"artifacts": [{"base64": stub.image, "finishReason": "SUCCESS"}]}
+                else:
+                    status, payload = 400, {"message": f"The provided model identifier is invalid: {model_id}"}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status != 200:
+                    self.send_header("x-amzn-ErrorType", "ValidationException")
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+def recipe_and_image(bedrock):
+    # The two calls process_ingredients makes
+    response = bedrock.invoke_model(
+        modelId="anthropic.claude-v2",
+        body=json.dumps({"prompt": "\nHuman: eggs\nAssistant:\n", "max_tokens_to_sample": 500, "temperature": 0.7}),
+    )
+    json.loads(response["body"].read())
+    response = bedrock.invoke_model(
+        modelId="stability.stable-diffusion-xl-v1",
+        body=json.dumps({"text_prompts": [{"text": "Egg Salad"}], "seed": 1, "steps": 50}),
+    )
+    json.loads(response["body"].read())
+
+
+def run(stub, users, requests, borrow):
+    def request(_):
+        start = time.perf_counter()
+        with borrow() as bedrock:
+            recipe_and_image(bedrock)
+        return time.perf_counter() - start
+
+    connections = stub.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        latencies = sorted(pool.map(request, range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+        "throughput": requests / wall,
+        "connections": stub.connections - connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency per call in seconds")
+    args = parser.parse_args()
+
+    # Fake credentials: the stub does not check signatures
+    os.environ.update({"AWS_ACCESS_KEY_ID": "stub", "AWS_SECRET_ACCESS_KEY": "stub", "AWS_DEFAULT_REGION": "us-east-1"})
+    stub = StubBedrock(args.latency)
+
+    class PerRequestClient:
+        # Previous behaviour: RecipeGenerator() builds a client on every call
+        def __enter__(self):
+            return boto3.client("bedrock-runtime", endpoint_url=stub.url)
+
+        def __exit__(self, *exc):
+            return False
+
+    start = time.perf_counter()
+    boto3.client("bedrock-runtime", endpoint_url=stub.url)
+    print(f"first client (cold import and service model load): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    pool = BedrockClientPool(size=args.users, endpoint_url=stub.url)
+    pool.start()
+    print(f"pool startup: {args.users} clients warmed in {pool.stats()['startup_seconds'] * 1000:.1f} ms")
+
+    for name, borrow in (("per-request client", PerRequestClient), ("pooled client", pool.client)):
+        stats = run(stub, args.users, args.requests, borrow)
+        print(
+            f"{name:>18}: p50 {stats['p50']:.1f} ms | p99 {stats['p99']:.1f} ms | "
+            f"{stats['throughput']:.1f} req/s | {stats['connections']} new connections"
+        )
+    print(json.dumps(pool.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import json
+
+
+class IncrementalJSONParser:
+    """
+    Parse a JSON document that arrives in chunks and report every value as soon
+    as it is syntactically complete.
+
+    Each completed value is reported as a (path, value) tuple, where path is a
+    tuple of object keys and array indices leading to the value, e.g.
+    ("recipe_details", "ingredients", 0). The root value is reported with the
+    empty path. Any text before the root object (such as a ```json fence) and
+    after it is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack = []  # open containers: {"kind", "start", "state", "key"}
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._string_is_key = False
+        self._scalar_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Consume the next chunk of the document.
+
+        Args:
+            chunk (str): The next piece of streamed text.
+
+        Returns:
+            list: (path, value) tuples for every value completed by this chunk.
+
+        Raises:
+            ValueError: If the text is not valid JSON.
+        """
+        self._text += chunk
+        events = []
+        text = self._text
+
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+
+            # Inside a string only an unescaped quote matters
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(events)
+                self._pos += 1
+                continue
+
+            # Numbers and literals end at the next delimiter, which is then reprocessed
+            if self._scalar_start is not None:
+                if ch in ",]}" or ch.isspace():
+                    self._complete_value(json.loads(text[self._scalar_start:self._pos]), events)
+                    self._scalar_start = None
+                    continue
+                self._pos += 1
+                continue
+
+            if ch.isspace():
+                self._pos += 1
+                continue
+
+            if not self._stack:
+                # Skip anything before the root container
+                if ch in "{[":
+                    self._open(ch)
+                self._pos += 1
+                continue
+
+            frame = self._stack[-1]
+            state = frame["state"]
+
+            if frame["kind"] == "object":
+                if state == "key" and ch == '"':
+                    self._start_string(is_key=True)
+                elif state == "key" and ch == "}":
+                    self._close(events)
+                elif state == "colon" and ch == ":":
+                    frame["state"] = "value"
+                elif state == "value":
+                    self._start_value(ch)
+                    continue
+                elif state == "comma" and ch == ",":
+                    frame["state"] = "key"
+                elif state == "comma" and ch == "}":
+                    self._close(events)
+                else:
+                    self._fail(ch)
+            else:
+                if state == "value" and ch == "]":
+                    self._close(events)
+                elif state == "value":
+                    frame["key"] += 1
+                    self._start_value(ch)
+                    continue
+                elif state == "comma" and ch == ",":
+                    frame["state"] = "value"
+                elif state == "comma" and ch == "]":
+                    self._close(events)
+                else:
+                    self._fail(ch)
+            self._pos += 1
+
+        return events
+
+    def _fail(self, ch):
+        raise ValueError(f"Unexpected character {ch!r} at position {self._pos}")
+
+    def _path(self):
+        return tuple(frame["key"] for frame in self._stack)
+
+    def _open(self, ch):
+        if ch == "{":
+            self._stack.append({"kind": "object", "start": self._pos, "state": "key", "key": None})
+        else:
+            self._stack.append({"kind": "array", "start": self._pos, "state": "value", "key": -1})
+
+    def _close(self, events):
+        frame = self._stack.pop()
+        value = json.loads(self._text[frame["start"]:self._pos + 1])
+        self._complete_value(value, events)
+
+    def _start_string(self, is_key):
+        self._in_string = True
+        self._string_is_key = is_key
+        self._string_start = self._pos
+
+    def _end_string(self, events):
+        value = json.loads(self._text[self._string_start:self._pos + 1])
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame["key"] = value
+            frame["state"] = "colon"
+        else:
+            self._complete_value(value, events)
+
+    def _start_value(self, ch):
+        # Called with self._pos on the first character of a value; advances past it
+        if ch in "{[":
+            self._open(ch)
+        elif ch == '"':
+            self._start_string(is_key=False)
+        elif ch in "-0123456789tfn":
+            self._scalar_start = self._pos
+        else:
+            self._fail(ch)
+        self._pos += 1
+
+    def _complete_value(self, value, events):
+        events.append((self._path(), value))
+        if self._stack:
+            self._stack[-1]["state"] = "comma"
+        else:
+            self.done = True
@@ -3,6 +3,19 @@ from PIL import Image
 import gradio as gr
 import os
 import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+# Set to send the Inference API calls to another server, e.g. the local mock in benchmarks/
+HF_BASE_URL = os.getenv("RECIPE_HF_BASE_URL")
+
+def inference_client(model_name: str, token: str) -> InferenceClient:
+    """
+    Returns an InferenceClient for the model, served from RECIPE_HF_BASE_URL when it is set.
+    """
+    if HF_BASE_URL:
+        return InferenceClient(f"{HF_BASE_URL.rstrip('/')}/models/{model_name}", token=token)
+    return InferenceClient(model_name, token=token)
 # Function to generate recipe from ingredients
 def generate_recipe(ingredients: str, model_name_recipe: str, token: str) -> str:
     """
@@ -15,7 +28,7 @@ def generate_recipe(ingredients: str, model_name_recipe: str, token: str) -> str
         str: Generated recipe text.
     """
     prompt = f"Generate a recipe using the following ingredients: {ingredients}. Write the recipe in detail along with a suitable title."
-    client = InferenceClient(model_name_recipe, token=token)
+    client = inference_client(model_name_recipe, token)
     try:
         response = client.post(
             json={
@@ -27,6 +40,23 @@ def generate_recipe(ingredients: str, model_name_recipe: str, token: str) -> str
         return json.loads(response.decode())[0]["generated_text"]
     except Exception as e:
         return f"Error generating recipe: {e}"    
+# Function to stream the recipe text as it is generated
+def generate_recipe_stream(ingredients: str, model_name_recipe: str, token: str):
+    """
+    Streaming variant of generate_recipe.
+    Args:
+        ingredients (str): Ingredients input by the user.
+        model_name_recipe (str): Hugging Face model for text generation.
+        token (str): API token for Hugging Face authentication.
+    Yields:
+        str: Generated text tokens (without the prompt).
+    """
+    prompt = f"Generate a recipe using the following ingredients: {ingredients}. Write the recipe in detail along with a suitable title."
+    client = inference_client(model_name_recipe, token)
+    try:
+        yield from client.text_generation(prompt, max_new_tokens=500, stream=True)
+    except Exception as e:
+        yield f"Error generating recipe: {e}"
 # Function to generate image of the recipe
 def generate_image(recipe_title: str, model_name_image: str, token: str) -> Image.Image:
     """
@@ -38,19 +68,127 @@ def generate_image(recipe_title: str, model_name_image: str, token: str) -> Imag
     Returns:
         PIL.Image.Image: Generated image.
     """
-    client = InferenceClient(model_name_image, token=token)
+    client = inference_client(model_name_image, token)
     try:
         prompt = f"A photo the dish: {recipe_title}, showing delicious presentation."
         return client.text_to_image(prompt)
     except Exception as e:
         print(f"Error generating image: {e}")
         return None    
-# Gradio function that combines both recipe generation and image generation
-def generate_recipe_and_image(message: str, history):
-    token = os.getenv("API_Token_HF_AIrecipe")  # Ensure your Hugging Face token is set in environment variables
-    model_name_recipe = "microsoft/Phi-3-mini-4k-instruct"  # Replace with the LLM model of your choice
-    model_name_image = "prompthero/openjourney"  # Replace with the image generation model of your choice
-    
+# Single-flight layer: concurrent identical requests share one generation
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+    The first caller runs the function; callers arriving while it is in flight
+    wait for it and receive the same result (or the same exception).
+    Nothing is kept once the call completes, so later requests generate afresh.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counters = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            self.counters["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.counters["coalesced"] += 1
+                leader = False
+            else:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                self.counters["executed"] += 1
+                leader = True
+
+        if leader:
+            try:
+                call["result"] = fn()
+            except Exception as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call["done"].set()
+        else:
+            call["done"].wait()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls))
+
+single_flight = SingleFlight()
+
+def normalize_message(message: str) -> str:
+    """
+    Normalizes the ingredient message so trivially different duplicates share a key:
+    lowercase, collapsed whitespace and ingredients sorted.
+    """
+    ingredients = [re.sub(r"\s+", " ", item).strip() for item in message.lower().split(",")]
+    return ", ".join(sorted(item for item in ingredients if item))
+
+def extract_title(recipe_text: str):
+    """
+    Returns the text of the first "Title:" line (case-insensitive), or None.
+    """
+    for line in recipe_text.split("\n"):
+        if line.lower().startswith("title:"):  # Case-insensitive match
+            return line.replace("Title:", "").strip()  # Extract and clean title
+    return None
+
+# Speculative image generation: start text_to_image as soon as the streamed
+# "Title:" line is complete, while the rest of the recipe is still generating
+SPECULATIVE_IMAGE = os.getenv("RECIPE_SPECULATIVE_IMAGE", "1") == "1"
+image_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RECIPE_IMAGE_WORKERS", 4)))
+speculation_lock = threading.Lock()
+speculation_counters = {"launched": 0, "fallback": 0}
+
+def count_speculation(name: str):
+    with speculation_lock:
+        speculation_counters[name] += 1
+
+def speculative_recipe_and_image(message: str, model_name_recipe: str, model_name_image: str, token: str):
+    """
+    Streams the recipe and generates its image from the first complete title line.
+    The image only depends on the title, and the finished text has the same first
+    "Title:" line, so the speculative image is always the one returned.
+    Returns:
+        tuple: (recipe_text, PIL.Image.Image)
+    """
+    recipe_text = ""
+    image_future = None
+    for text in generate_recipe_stream(message, model_name_recipe, token):
+        recipe_text += text
+        if image_future is None and "\n" in text:
+            # Only completed lines; the last one may still be growing
+            recipe_title = extract_title(recipe_text.rsplit("\n", 1)[0])
+            if recipe_title:
+                image_future = image_executor.submit(generate_image, recipe_title, model_name_image, token)
+                count_speculation("launched")
+
+    recipe_text = recipe_text.strip()
+    if image_future is not None:
+        print("recipe_title",recipe_title)
+        return recipe_text, image_future.result()
+    # No title line: the image is made from the message once the text is done
+    count_speculation("fallback")
+    recipe_title = extract_title(recipe_text) or message
+    print("recipe_title",recipe_title)
+    return recipe_text, generate_image(recipe_title, model_name_image, token)
+
+def recipe_and_image(message: str, model_name_recipe: str, model_name_image: str, token: str):
+    """
+    Generates the recipe text and its image for one message.
+    Returns:
+        tuple: (recipe_text, PIL.Image.Image)
+    """
+    if SPECULATIVE_IMAGE:
+        return speculative_recipe_and_image(message, model_name_recipe, model_name_image, token)
+
     # Generate recipe
     recipe_text = generate_recipe(message, model_name_recipe, token)
     prompt_to_remove = f"Generate a recipe using the following ingredients: {message}. Write the recipe in detail along with a suitable title."
@@ -58,24 +196,33 @@ def generate_recipe_and_image(message: str, history):
         recipe_text = recipe_text.replace(prompt_to_remove, "").strip()
     # print("recipe_text:",recipe_text)
     # Extract recipe title from generated recipe text
-    lines = recipe_text.split("\n")
-    for line in lines:
-        if line.lower().startswith("title:"):  # Case-insensitive match
-            recipe_title = line.replace("Title:", "").strip()  # Extract and clean title
-            break 
+    recipe_title = extract_title(recipe_text) or message
     print("recipe_title",recipe_title)    
     # Generate image for the recipe
     recipe_image = generate_image(recipe_title, model_name_image, token)
-    image_path = "./recipe_image.png"
-    recipe_image.save(image_path, format="PNG")
+    return recipe_text, recipe_image
+
+# Gradio function that combines both recipe generation and image generation
+def generate_recipe_and_image(message: str, history):
+    token = os.getenv("API_Token_HF_AIrecipe")  # Ensure your Hugging Face token is set in environment variables
+    model_name_recipe = "microsoft/Phi-3-mini-4k-instruct"  # Replace with the LLM model of your choice
+    model_name_image = "prompthero/openjourney"  # Replace with the image generation model of your choice
+    
+    # Identical messages submitted at the same time wait on one generation
+    key = (normalize_message(message), model_name_recipe, model_name_image)
+    recipe_text, recipe_image = single_flight.do(
+        key, lambda: recipe_and_image(message, model_name_recipe, model_name_image, token)
+    )
     
-    # Combine text and image
-    return recipe_text, gr.Image(value=image_path)    
+    # Combine text and image; the PIL image is handed to Gradio directly, which
+    # encodes it once into its per-content cache (no shared ./recipe_image.png)
+    return recipe_text, gr.Image(value=recipe_image)    
     
 
 if __name__ == "__main__":
     # Gradio UI
-    with gr.Blocks(theme=gr.themes.Monochrome()) as demo:
+    # Hourly, delete cached recipe images older than an hour
+    with gr.Blocks(theme=gr.themes.Monochrome(), delete_cache=(3600, 3600)) as demo:
         gr_image = gr.Image(render=False)
         with gr.Row():
             with gr.Column(scale=4):
@@ -0,0 +1,130 @@
+"""
+Benchmark of the recipe image handoff from generate_recipe_and_image to Gradio.
+
+Compares, per request and under concurrency:
+  file:   the previous handoff. The PIL image is saved as PNG to the shared
+          ./recipe_image.png, then Gradio hashes that file and copies it into
+          its cache (Gradio 5 postprocess of a filepath).
+  memory: the current handoff. The PIL image is returned as is, and Gradio
+          encodes it once into a content-addressed cache file (postprocess of
+          a PIL image, default webp).
+
+Both Gradio steps are reproduced with PIL, hashlib and shutil so the benchmark
+runs without a Gradio server. "bytes copied" counts every byte encoded,
+written or read on the way to the cache file. "wrong image" counts requests
+whose cached file is not their own image (or is torn), because another
+request overwrote the shared file in between.
+
+Usage:
+    python bench_image_handoff.py --users 8 --requests 64 --size 512
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+
+def make_image(seed, size):
+    # A noisy gradient tinted per request, roughly as compressible as a photo
+    noise = Image.effect_noise((size, size), 40 + seed % 20).convert("RGB")
+    tint = Image.new("RGB", (size, size), ((seed * 67) % 256, (seed * 131) % 256, (seed * 29) % 256))
+    return Image.blend(noise, tint, 0.5)
+
+
+def file_handoff(image, workdir, cache_dir):
+    # Old app code: recipe_image.save("./recipe_image.png", format="PNG")
+    image_path = os.path.join(workdir, "recipe_image.png")
+    image.save(image_path, format="PNG")
+    copied = os.path.getsize(image_path)
+    # Gradio: hash the file, then copy it into <cache>/<hash>/
+    sha = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        data = f.read()
+    sha.update(data)
+    copied += len(data)
+    target_dir = os.path.join(cache_dir, sha.hexdigest())
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, "recipe_image.png")
+    shutil.copy(image_path, target)
+    copied += 2 * len(data)
+    return target, copied
+
+
+def memory_handoff(image, workdir, cache_dir):
+    # Gradio: encode the PIL image once, write it to <cache>/<hash>/image.webp
+    buffer = io.BytesIO()
+    image.save(buffer, format="webp")
+    data = buffer.getvalue()
+    target_dir = os.path.join(cache_dir, hashlib.sha256(data).hexdigest())
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, "image.webp")
+    with open(target, "wb") as f:
+        f.write(data)
+    return target, 2 * len(data)
+
+
+def delivered_own_image(path, image):
+    # Each request's image has its own tint, so its mean colour identifies it
+    # (within a small tolerance for lossy webp); a torn file cannot be opened
+    try:
+        with Image.open(path) as delivered:
+            mean = delivered.convert("RGB").resize((1, 1), Image.BOX).getpixel((0, 0))
+    except (OSError, SyntaxError):
+        return False
+    expected = image.resize((1, 1), Image.BOX).getpixel((0, 0))
+    return all(abs(a - b) <= 4 for a, b in zip(mean, expected))
+
+
+def run(handoff, images, users):
+    workdir = tempfile.mkdtemp()
+    cache_dir = tempfile.mkdtemp()
+
+    def request(index):
+        start = time.perf_counter()
+        target, copied = handoff(images[index], workdir, cache_dir)
+        elapsed = time.perf_counter() - start
+        return elapsed, copied, not delivered_own_image(target, images[index])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(request, range(len(images))))
+    wall = time.perf_counter() - start
+    shutil.rmtree(workdir)
+    shutil.rmtree(cache_dir)
+
+    latencies = sorted(r[0] for r in results)
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+        "bytes_per_request": sum(r[1] for r in results) / len(results),
+        "wrong_image": sum(r[2] for r in results),
+        "throughput": len(results) / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--size", type=int, default=512, help="image side in pixels (openjourney returns 512)")
+    args = parser.parse_args()
+
+    images = [make_image(seed, args.size) for seed in range(args.requests)]
+    for name, handoff in (("file", file_handoff), ("memory", memory_handoff)):
+        stats = run(handoff, images, args.users)
+        print(
+            f"{name:>6}: p50 {stats['p50_ms']:.1f} ms | p99 {stats['p99_ms']:.1f} ms | "
+            f"{stats['bytes_per_request'] / 1024:.0f} KiB copied/request | "
+            f"{stats['throughput']:.1f} req/s | wrong image {stats['wrong_image']}/{args.requests}"
+        )
+
+
+if __name__ == "__main__":
+    main()
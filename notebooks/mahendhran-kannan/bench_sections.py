@@ -0,0 +1,126 @@
+"""
+Fuzz check and microbenchmark for the single-pass section parser.
+
+The fuzz check generates random, often malformed completions (missing,
+repeated and out-of-order headers, headers without a colon, stray whitespace)
+and verifies that parse_sections and SectionParser fed with random chunk
+sizes return exactly what four extract_section calls return.
+
+The benchmark times both approaches on large malformed completions.
+
+Usage:
+    python bench_sections.py --cases 5000 --lines 20000
+"""
+import argparse
+import random
+import time
+
+from src.utils import VALID_SECTIONS, SectionParser, extract_section, parse_sections
+
+FRAGMENTS = [
+    "Title: Spicy Garlic Chicken",
+    "Ingredients:",
+    "Instructions:",
+    "Summary: A golden dish with fresh herbs.",
+    "Title:",
+    "Title Garlic",
+    "title: lower case header",
+    "  Ingredients:   - leading spaces",
+    "Summary:Summary: doubled",
+    "- 2 cloves garlic",
+    "- 1 cup rice",
+    "1. Heat the pan.",
+    "2. Add the chicken: cook until golden.",
+    "Notes: not a section",
+    "",
+    "   ",
+    "\t",
+    "Instructions: inline first step",
+    "Ingredients:Instructions:",
+    "\r",
+]
+
+
+def random_completion(rng, lines):
+    return "\n".join(rng.choice(FRAGMENTS) + rng.choice(["", " ", "\r"]) for _ in range(lines))
+
+
+def expected(text):
+    return {section: extract_section(text, section) for section in VALID_SECTIONS}
+
+
+def streamed(rng, text):
+    parser = SectionParser()
+    events = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        events += parser.feed(text[position:position + size])
+        position += size
+    events += parser.close()
+    return parser.results(), events
+
+
+def fuzz(cases, seed):
+    rng = random.Random(seed)
+    for case in range(cases):
+        text = random_completion(rng, rng.randint(0, 40))
+        want = expected(text)
+        got = parse_sections(text)
+        assert got == want, f"case {case}: parse_sections mismatch\n{text!r}\n{got}\n{want}"
+
+        results, events = streamed(rng, text)
+        assert results == want, f"case {case}: streaming mismatch\n{text!r}\n{results}\n{want}"
+        # Every closed section is reported once, with its final text
+        names = [name for name, _ in events]
+        assert len(names) == len(set(names)), f"case {case}: section closed twice {names}"
+        for name, section_text in events:
+            assert section_text == want[name], f"case {case}: early event for {name}"
+    print(f"fuzz: {cases} cases OK")
+
+
+def long_completion(rng, lines):
+    # Realistic shape: few headers, long bodies, and a repeated section at the end
+    body = [rng.choice(FRAGMENTS[9:13]) for _ in range(lines)]
+    return "\n".join(
+        ["Title: Spicy Garlic Chicken", "Ingredients:"] + body[: lines // 3]
+        + ["Instructions:"] + body[lines // 3:]
+        + ["Summary: A golden dish.", "Ingredients: repeated by the model"] + body[:50]
+    )
+
+
+def benchmark(name, text, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        expected(text)
+    per_section = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        parse_sections(text)
+    single_pass = (time.perf_counter() - start) / repeats
+
+    print(
+        f"benchmark {name}: {text.count(chr(10)) + 1} lines, {len(text)} chars | "
+        f"4x extract_section {per_section * 1000:.2f} ms | "
+        f"parse_sections {single_pass * 1000:.2f} ms | "
+        f"{per_section / single_pass:.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fuzz(args.cases, args.seed)
+    rng = random.Random(args.seed)
+    benchmark("dense headers", random_completion(rng, args.lines), args.repeats)
+    benchmark("long sections", long_completion(rng, args.lines), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
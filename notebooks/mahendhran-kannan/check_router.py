@@ -0,0 +1,121 @@
+"""
+Exercise the hedged router against local fake OpenAI- and HF-compatible servers.
+
+Two local servers speak the chat completions API (one is called through the
+OpenAI client, one through huggingface_hub's InferenceClient). Per-model
+latency and failures are switched between scenarios to check that the router
+hedges a slow primary, fails over on errors and reports its statistics.
+
+Usage:
+    python check_router.py
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.client_registry import get_openai_client, get_huggingface_client, registry
+from src.router import HedgedRouter
+
+
+class FakeChatServer:
+    # Minimal chat completions endpoint with per-model latency and failures
+    def __init__(self):
+        self.latency = {}
+        self.failing = set()
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so connection reuse shows up in the registry stats
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                model = body.get("model")
+                server.requests += 1
+                time.sleep(server.latency.get(model, 0.01))
+                if model in server.failing:
+                    payload, status = {"error": {"message": f"{model} is down"}}, 400
+                else:
+                    payload, status = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": f"Title: from {model}"},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4},
+                    }, 200
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+def main():
+    openai_server = FakeChatServer()
+    hf_server = FakeChatServer()
+
+    def call(model, prompt):
+        messages = [{"role": "user", "content": prompt}]
+        if model.startswith("gpt-"):
+            client = get_openai_client("fake-key", openai_server.url).with_options(max_retries=0)
+            return client.chat.completions.create(model=model, messages=messages).choices[0].message.content
+        client = get_huggingface_client("fake-key", hf_server.url)
+        return client.chat.completions.create(model=model, messages=messages).choices[0].message.content
+
+    primary, alternate = "gpt-4o-mini", "meta-llama/Llama-3.3-70B-Instruct"
+    router = HedgedRouter(call, {primary: [alternate], alternate: [primary]}, default_hedge_after=1.0, min_samples=10)
+
+    # Warm up the primary's latency histogram (p90 around 50 ms)
+    openai_server.latency[primary] = 0.05
+    for _ in range(20):
+        text, answered_by = router.complete(primary, "eggs")
+        assert answered_by == primary, answered_by
+    print(f"warm-up: p90={router.stats()['models'][primary]['p90'] * 1000:.0f} ms")
+
+    # Slow primary: the hedge to the alternate should win well before the primary finishes
+    openai_server.latency[primary] = 2.0
+    hf_server.latency[alternate] = 0.05
+    start = time.perf_counter()
+    text, answered_by = router.complete(primary, "eggs")
+    elapsed = time.perf_counter() - start
+    assert answered_by == alternate and elapsed < 1.0, (answered_by, elapsed)
+    print(f"hedge: answered by {answered_by} in {elapsed * 1000:.0f} ms (primary takes 2000 ms)")
+
+    # Failing primary: fail over immediately
+    openai_server.latency[primary] = 0.01
+    openai_server.failing.add(primary)
+    text, answered_by = router.complete(primary, "eggs")
+    assert answered_by == alternate, answered_by
+    print(f"failover: answered by {answered_by}")
+
+    # Everything down: the last error is raised
+    hf_server.failing.add(alternate)
+    try:
+        router.complete(primary, "eggs")
+    except Exception as e:
+        print(f"all down: raised {type(e).__name__}")
+    else:
+        raise AssertionError("expected an error when every model fails")
+
+    print(json.dumps(router.stats(), indent=2))
+    print(json.dumps(registry.stats(), indent=2))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
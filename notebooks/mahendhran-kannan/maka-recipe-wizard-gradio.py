@@ -1,24 +1,19 @@
-import time
 import gradio as gr
-from src.llm_model import LLM_MODELS, llm_init
+from src.llm_model import LLM_MODELS, llm_init_stream
 
 # Handlers
 def generate_recipe(selected_model, user_ingredients):
     """
-    This function handles the recipe generation and simulates a live text stream
-    by adding a delay between words.
+    This function handles the recipe generation and streams the provider's
+    tokens to the textboxes as each line of the recipe arrives.
     """
     if not user_ingredients:
-        return "Add some ingredients, please!", "", "", ""
+        yield "Add some ingredients, please!", "", "", None
+        return
     
-    # Call the LLM to generate the recipe
-    title, ingredients, instructions, image_url = llm_init(selected_model, user_ingredients)
-    
-    # Streamed response for ingredients and instructions
-    ingredients_stream = " ".join(word for word in ingredients.split(" "))
-    instructions_stream = " ".join(word for word in instructions.split(" "))
-    
-    return title, ingredients_stream, instructions_stream, image_url
+    # Call the LLM to stream the recipe
+    for title, ingredients, instructions, image_url in llm_init_stream(selected_model, user_ingredients):
+        yield title, ingredients, instructions, image_url
 
 # Gradio Interface
 with gr.Blocks() as demo:
@@ -1,16 +1,10 @@
-import time
 import streamlit as st
-from src.llm_model import LLM_MODELS, llm_init
+from src.llm_model import LLM_MODELS, llm_init_stream
 
 # handlers
 def click_button():
     st.session_state.clicked = True
 
-def stream_data(mytext):
-    for word in mytext.split(" "):
-        yield word + " "
-        time.sleep(0.02)
-
 # streamlit markups
 st.title("AI Recipe Wizard")
 
@@ -31,17 +25,23 @@ if 'clicked' not in st.session_state:
 col1, col2 = st.columns(2)
 if st.session_state.clicked:   
     if len(user_ingredients) > 0:         
-        with st.spinner('Chef is preparing.. Wait for the magic recipe...'):
-            # LLM call to generate the recipe
-            title, ingredients, instructions, image_url = llm_init(selected_model, user_ingredients)        
         with col1:
             st.write(f":male-cook:**Ingredients** :sparkles:")
-            st.write_stream(stream_data(ingredients))
+            ingredients_box = st.empty()
             st.write(f":male-cook:**instructions** :sparkles:")
-            st.write_stream(stream_data(instructions))
+            instructions_box = st.empty()
         with col2:
-            st.header(f":male-cook:**{title}** :sparkles:")
-            st.image(image_url)                
+            title_box = st.empty()
+            image_box = st.empty()
+        with st.spinner('Chef is preparing.. Wait for the magic recipe...'):
+            # LLM call streams the recipe; each section is filled in as it arrives
+            for title, ingredients, instructions, image_url in llm_init_stream(selected_model, user_ingredients):
+                ingredients_box.write(ingredients)
+                instructions_box.write(instructions)
+                if title:
+                    title_box.header(f":male-cook:**{title}** :sparkles:")
+                if image_url:
+                    image_box.image(image_url)
         st.success("Done!")
     else:
         st.write("Add some ingredients please!")
@@ -30,13 +30,11 @@ if st.session_state.clicked:
     if len(user_ingredients) > 0:
         #st.write('Button clicked!') 
         from config.secrets import OPENAI_API_KEY #, MK_HF_API_KEY
-        from openai import OpenAI
+        from src.client_registry import get_openai_client
 
         model =  "gpt-3.5-turbo" # "gpt-4o-mini"
         print(prompt)
-        client = OpenAI(
-            api_key=OPENAI_API_KEY,
-        )
+        client = get_openai_client(OPENAI_API_KEY)
         with st.spinner('Chef is preparing.. Wait for the magic recipe...'):
             time.sleep(5)
             title, ingredients, instructions, summary = generate_text(client, model, user_ingredients)
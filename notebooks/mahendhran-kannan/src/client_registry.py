@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from openai import OpenAI
+from huggingface_hub import InferenceClient
+
+try:
+    from huggingface_hub import configure_http_backend
+except ImportError:  # huggingface_hub >= 1.0 shares one httpx client instead of requests sessions
+    from huggingface_hub import get_session
+    configure_http_backend = None
+
+# Connection pool sizes, shared by every client the registry creates
+POOL_SETTINGS = {
+    "max_connections": int(os.getenv("MK_POOL_MAX_CONNECTIONS", 20)),
+    "max_keepalive_connections": int(os.getenv("MK_POOL_MAX_KEEPALIVE", 10)),
+    "keepalive_expiry": float(os.getenv("MK_POOL_KEEPALIVE_EXPIRY", 300)),
+}
+
+
+def configure_pools(max_connections=None, max_keepalive_connections=None, keepalive_expiry=None):
+    # Change the pool sizes used for clients created after this call
+    if max_connections is not None:
+        POOL_SETTINGS["max_connections"] = max_connections
+    if max_keepalive_connections is not None:
+        POOL_SETTINGS["max_keepalive_connections"] = max_keepalive_connections
+    if keepalive_expiry is not None:
+        POOL_SETTINGS["keepalive_expiry"] = keepalive_expiry
+
+
+def _fingerprint(api_key):
+    # Identify a key in stats without exposing it
+    return hashlib.sha256(str(api_key).encode()).hexdigest()[:8]
+
+
+class _ConnectionStats:
+    # Counts requests and new connections through httpx/httpcore trace events
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def on_request(self, request):
+        with self.lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    def trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self.lock:
+                self.new_connections += 1
+        elif event_name == "connection.start_tls.complete":
+            with self.lock:
+                self.tls_handshakes += 1
+
+    def snapshot(self):
+        with self.lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_connections": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            }
+
+
+class _HuggingFaceSessionStats:
+    # Reads request and connection counts from the urllib3 pools behind huggingface_hub
+    def __init__(self):
+        self.adapters = []
+
+    def make_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=POOL_SETTINGS["max_keepalive_connections"],
+            pool_maxsize=POOL_SETTINGS["max_connections"],
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.adapters.append(adapter)
+        return session
+
+    def snapshot(self):
+        requests_sent = 0
+        connections = 0
+        for adapter in self.adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        reused = max(requests_sent - connections, 0)
+        return {
+            "requests": requests_sent,
+            "new_connections": connections,
+            "reused_connections": reused,
+            "reuse_ratio": reused / requests_sent if requests_sent else 0.0,
+        }
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of LLM and image clients keyed by provider, API key and base URL.
+
+    Clients are created once and kept for the life of the process, so their
+    keep-alive connection pools stay warm across Streamlit reruns and Gradio
+    requests instead of paying for a new TLS handshake on every call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._stats = {}
+        self._hf_stats = None
+
+    def openai(self, api_key, base_url=None):
+        key = ("openai", api_key, base_url)
+        with self._lock:
+            if key not in self._clients:
+                stats = _ConnectionStats()
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=POOL_SETTINGS["max_connections"],
+                        max_keepalive_connections=POOL_SETTINGS["max_keepalive_connections"],
+                        keepalive_expiry=POOL_SETTINGS["keepalive_expiry"],
+                    ),
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                    event_hooks={"request": [stats.on_request]},
+                )
+                self._clients[key] = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                self._stats[key] = stats
+            return self._clients[key]
+
+    def huggingface(self, api_key, base_url=None):
+        key = ("huggingface", api_key, base_url)
+        with self._lock:
+            if key not in self._clients:
+                if self._hf_stats is None:
+                    if configure_http_backend is not None:
+                        # huggingface_hub shares one requests session per thread; give it pooled adapters
+                        self._hf_stats = _HuggingFaceSessionStats()
+                        configure_http_backend(backend_factory=self._hf_stats.make_session)
+                    else:
+                        # The shared httpx client keeps its own pool; count its connections
+                        self._hf_stats = _ConnectionStats()
+                        get_session().event_hooks["request"].append(self._hf_stats.on_request)
+                self._clients[key] = InferenceClient(api_key=api_key, base_url=base_url)
+            return self._clients[key]
+
+    def stats(self):
+        # Per-client connection reuse statistics
+        with self._lock:
+            keys = list(self._clients)
+        report = {}
+        for key in keys:
+            provider, api_key, base_url = key
+            name = f"{provider}:{_fingerprint(api_key)}"
+            if base_url:
+                name += f"@{base_url}"
+            if provider == "openai":
+                report[name] = self._stats[key].snapshot()
+            else:
+                # All Hugging Face clients share the huggingface_hub session pools
+                report[name] = self._hf_stats.snapshot()
+        return report
+
+    def close(self):
+        with self._lock:
+            for (provider, _, _), client in self._clients.items():
+                if provider == "openai":
+                    client.close()
+            self._clients.clear()
+            self._stats.clear()
+
+
+# Shared by every module in the process
+registry = ClientRegistry()
+
+
+# Base URLs can point the apps at local OpenAI/HF-compatible servers
+def get_openai_client(api_key, base_url=None):
+    return registry.openai(api_key, base_url or os.getenv("MK_OPENAI_BASE_URL"))
+
+
+def get_huggingface_client(api_key, base_url=None):
+    return registry.huggingface(api_key, base_url or os.getenv("MK_HF_BASE_URL"))
@@ -1,15 +1,28 @@
-from openai import OpenAI
+import base64
 from config.secrets import OPENAI_API_KEY
+from src.client_registry import get_openai_client
+from src.image_store import image_store, image_key
+from src.rate_limiter import rate_limiter
 # Function to send a prompt to generate image as per the recipe
-def generate_image(image_prompt, size="1024x1024"):
-  client = OpenAI(
-                api_key=OPENAI_API_KEY,
-            )
-  response = client.images.generate(
-      model="dall-e-3",
-      prompt=image_prompt,
-      n=1,  # Number of images to generate
-      size=size  # Image size
+# Returns the path of a local copy, so repeated prompts cost nothing and
+# the front-ends never fetch from the provider CDN
+def generate_image(image_prompt, size="1024x1024", model="dall-e-3"):
+  key = image_key(image_prompt, model, size)
+  image_path = image_store.lookup(key)
+  if image_path is not None:
+    return image_path
+
+  client = get_openai_client(OPENAI_API_KEY).with_options(max_retries=0)
+  # Paced against the per-model images/min limit, 429s retried by the limiter
+  response = rate_limiter.call(
+      "openai", model,
+      lambda: client.images.generate(
+          model=model,
+          prompt=image_prompt,
+          n=1,  # Number of images to generate
+          size=size,  # Image size
+          response_format="b64_json"  # Image bytes instead of a short-lived URL
+      ),
   )
-   # Extract the generated image URL
-  return response.data[0].url
+   # Store the generated image locally
+  return image_store.put(key, base64.b64decode(response.data[0].b64_json))
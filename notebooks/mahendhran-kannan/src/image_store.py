@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def image_key(image_prompt, model, image_size, index=0):
+    """
+    Build a content address for a generated image.
+
+    Args:
+        image_prompt (str): The prompt describing the image.
+        model (str): The image model used to render it.
+        image_size (str): The requested resolution (e.g., "1024x1024").
+        index (int): Position of the image when several are generated for one prompt.
+
+    Returns:
+        str: A SHA-256 hex digest of the normalized prompt, model, size and index.
+    """
+    normalized_prompt = " ".join(str(image_prompt).lower().split())
+    payload = json.dumps([normalized_prompt, model, image_size, index])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageStore:
+    """
+    Size-bounded on-disk store for generated images, keyed by image_key.
+
+    Each image is written once as <root>/<key[:2]>/<key>.png. Reads refresh the
+    file's modification time, and once the store grows past `max_bytes` the
+    least recently used files are deleted.
+    """
+
+    def __init__(self, root_dir, max_bytes=500 * 1024 * 1024):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        # key -> (last_used, size); rebuilt from disk so the store survives restarts
+        self._index = {}
+        os.makedirs(root_dir, exist_ok=True)
+        for dirpath, _, filenames in os.walk(root_dir):
+            for filename in filenames:
+                if filename.endswith(".png"):
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    self._index[filename[:-4]] = (stat.st_mtime, stat.st_size)
+        self._total_bytes = sum(size for _, size in self._index.values())
+
+    def path(self, key):
+        """Return the file path an image is (or would be) stored at."""
+        return os.path.join(self.root_dir, key[:2], f"{key}.png")
+
+    def lookup(self, key):
+        """
+        Find a stored image without reading it.
+
+        Args:
+            key (str): A key built with image_key.
+
+        Returns:
+            str or None: The image path, or None if the image is not stored.
+        """
+        with self._lock:
+            path = self.path(key)
+            if key not in self._index or not os.path.exists(path):
+                self._stats["misses"] += 1
+                return None
+            os.utime(path)
+            self._index[key] = (os.path.getmtime(path), self._index[key][1])
+            self._stats["hits"] += 1
+            return path
+
+    def get(self, key):
+        """
+        Read a stored image.
+
+        Args:
+            key (str): A key built with image_key.
+
+        Returns:
+            bytes or None: The image bytes, or None if the image is not stored.
+        """
+        with self._lock:
+            if key not in self._index:
+                self._stats["misses"] += 1
+                return None
+            try:
+                with open(self.path(key), "rb") as image_file:
+                    data = image_file.read()
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                # Removed behind our back; treat as a miss
+                _, size = self._index.pop(key)
+                self._total_bytes -= size
+                self._stats["misses"] += 1
+                return None
+            self._index[key] = (os.path.getmtime(self.path(key)), len(data))
+            self._stats["hits"] += 1
+            return data
+
+    def put(self, key, data):
+        """
+        Store an image and evict the least recently used ones beyond the size limit.
+
+        Args:
+            key (str): A key built with image_key.
+            data (bytes): The encoded image.
+
+        Returns:
+            str: The path the image was written to.
+        """
+        path = self.path(key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial image
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as image_file:
+                image_file.write(data)
+            os.replace(tmp_path, path)
+
+            if key in self._index:
+                self._total_bytes -= self._index[key][1]
+            self._index[key] = (os.path.getmtime(path), len(data))
+            self._total_bytes += len(data)
+            self._evict(keep=key)
+        return path
+
+    def _evict(self, keep):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            del self._index[key]
+            self._total_bytes -= size
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        """
+        Report store usage and hit/miss counters.
+
+        Returns:
+            dict: Hits, misses, evictions, entry count and bytes on disk.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._total_bytes
+        return stats
+
+
+# Local copies of the DALL·E images, served to Streamlit and Gradio as file paths
+image_store = ImageStore(
+    root_dir=os.getenv(
+        "MK_IMAGE_STORE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "image_store"),
+    ),
+    max_bytes=int(os.getenv("MK_IMAGE_STORE_MAX_BYTES", 500 * 1024 * 1024)),
+)
@@ -1,38 +1,51 @@
 from config.secrets import OPENAI_API_KEY, MK_HF_API_KEY
-from openai import OpenAI
 from src.prompt_setup import prompt_setup
 from src.image_gen import generate_image
-from src.utils import extract_section
-from huggingface_hub import InferenceClient
+from src.utils import parse_sections, SectionParser
+from src.client_registry import get_openai_client, get_huggingface_client
+from src.router import HedgedRouter
+from src.rate_limiter import rate_limiter, estimate_tokens
+import os
 
-# Dictionary of LLM models and their corresponding API keys
+# Dictionary of LLM models, their corresponding API keys and equivalent models
+# on the other provider used for hedging and failover
 LLM_MODELS = {
-    "gpt-3.5-turbo": {"type": 1, "key": OPENAI_API_KEY},
-    "gpt-4o-mini": {"type": 1, "key": OPENAI_API_KEY},
-    "meta-llama/Llama-3.3-70B-Instruct": {"type": 2, "key": MK_HF_API_KEY},
-    "meta-llama/Llama-2-7b-chat-hf": {"type": 2, "key": MK_HF_API_KEY},
+    "gpt-3.5-turbo": {"type": 1, "key": OPENAI_API_KEY, "alternates": ["meta-llama/Llama-2-7b-chat-hf"]},
+    "gpt-4o-mini": {"type": 1, "key": OPENAI_API_KEY, "alternates": ["meta-llama/Llama-3.3-70B-Instruct"]},
+    "meta-llama/Llama-3.3-70B-Instruct": {"type": 2, "key": MK_HF_API_KEY, "alternates": ["gpt-4o-mini"]},
+    "meta-llama/Llama-2-7b-chat-hf": {"type": 2, "key": MK_HF_API_KEY, "alternates": ["gpt-3.5-turbo"]},
 }
 
 llm_role_set = "You are a world-renowned chef"
 
+# Actual tokens from the response usage, to give back the unused reservation
+def _used_tokens(completion):
+    usage = getattr(completion, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
 # Huggingface
 def huggingface_connect(_model, _api_key, prompt):
 
     print("..huggingface_connect.1.")
 
-    client = InferenceClient(api_key=_api_key)
+    client = get_huggingface_client(_api_key)
     messages = [
         {
             "role": "user",
             "content": f"{llm_role_set + ' ' + prompt}"
         }
     ]
-    completion = client.chat.completions.create(
-    model=_model, 
-    messages=messages, 
-    max_tokens=500
+    completion = rate_limiter.call(
+        "huggingface", _model,
+        lambda: client.chat.completions.create(
+        model=_model, 
+        messages=messages, 
+        max_tokens=500
+        ),
+        tokens=estimate_tokens(messages[0]["content"], 500),
+        usage=_used_tokens,
     )
-    response = completion.choices[0].message
+    response = completion.choices[0].message.content
     print("..huggingface_connect.2..response...")
     print(response)
     return response       
@@ -40,10 +53,11 @@ def huggingface_connect(_model, _api_key, prompt):
    
 # OpenAI
 def openAI_connect(_model, api_key, prompt):   
-    client = OpenAI(
-                api_key=api_key,
-            )
-    response = client.chat.completions.create(
+    # 429s are retried by the rate limiter, which also adapts its concurrency to them
+    client = get_openai_client(api_key).with_options(max_retries=0)
+    response = rate_limiter.call(
+        "openai", _model,
+        lambda: client.chat.completions.create(
             model=_model,  
             messages=[
                 {"role": "system", "content": llm_role_set},
@@ -51,27 +65,36 @@ def openAI_connect(_model, api_key, prompt):
             ],
             max_tokens=1000,
             temperature=0.7,           
-        )
+        ),
+        tokens=estimate_tokens(llm_role_set + prompt, 1000),
+        usage=_used_tokens,
+    )
 
     # Extract recipe content
     recipe_content = response.choices[0].message.content
     return recipe_content
 
-# Use LLM as per choice
-def llm_init(_model, user_input):   
-    #api_key = LLM_MODELS[_model]  # get key of the selected model
+# Call a single model on its own backend
+def connect(_model, prompt):
     model_info = LLM_MODELS[_model]
     model_type = model_info["type"]
     api_key = model_info["key"]
 
-    prompt =  prompt_setup(user_input)
-    
     if model_type == 1:  
-         response = openAI_connect(_model, api_key, prompt)
+         return openAI_connect(_model, api_key, prompt)
     elif model_type == 2:      
-         response = huggingface_connect(_model, api_key, prompt)
-    else:
-        return "Invalid option"          
+         return huggingface_connect(_model, api_key, prompt)
+    raise ValueError(f"Invalid model type for {_model}")
+
+# Use LLM as per choice
+def llm_init(_model, user_input):   
+    if _model not in LLM_MODELS:
+        return "Invalid option"
+
+    prompt =  prompt_setup(user_input)
+    
+    response, answered_by = llm_router.complete(_model, prompt)
+    print(f"..llm_init..answered by {answered_by}")
    
     title, ingredients, instructions, image_url = extract_response(response)
     return title, ingredients, instructions, image_url
@@ -79,9 +102,103 @@ def llm_init(_model, user_input):
 # Format Output
 def extract_response(recipe_content):
        # Extract the sections
-        title = extract_section(recipe_content, "Title") 
-        ingredients = extract_section(recipe_content, "Ingredients")
-        instructions = extract_section(recipe_content, "Instructions")
-        summary = extract_section(recipe_content, "Summary")
+        sections = parse_sections(recipe_content)
+        title = sections["Title"]
+        ingredients = sections["Ingredients"]
+        instructions = sections["Instructions"]
+        summary = sections["Summary"]
         image_url = generate_image(summary)        
-        return title, ingredients, instructions, image_url   
\ No newline at end of file
+        return title, ingredients, instructions, image_url
+
+
+# Streaming variants: yield the provider's tokens as they arrive
+def _stream_tokens(stream):
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        token = chunk.choices[0].delta.content
+        if token:
+            yield token
+
+# Huggingface (streaming)
+def huggingface_connect_stream(_model, _api_key, prompt):
+    client = get_huggingface_client(_api_key)
+    messages = [
+        {
+            "role": "user",
+            "content": f"{llm_role_set + ' ' + prompt}"
+        }
+    ]
+    # The slot is held until the stream is fully read
+    with rate_limiter.slot("huggingface", _model, estimate_tokens(messages[0]["content"], 500)):
+        stream = client.chat.completions.create(
+            model=_model,
+            messages=messages,
+            max_tokens=500,
+            stream=True
+        )
+        yield from _stream_tokens(stream)
+
+# OpenAI (streaming)
+def openAI_connect_stream(_model, api_key, prompt):
+    client = get_openai_client(api_key).with_options(max_retries=0)
+    # The slot is held until the stream is fully read
+    with rate_limiter.slot("openai", _model, estimate_tokens(llm_role_set + prompt, 1000)):
+        stream = client.chat.completions.create(
+                model=_model,
+                messages=[
+                    {"role": "system", "content": llm_role_set},
+                    {"role": "user", "content":prompt}
+                ],
+                max_tokens=1000,
+                temperature=0.7,
+                stream=True
+            )
+        yield from _stream_tokens(stream)
+
+# Stream a single model from its own backend
+def connect_stream(_model, prompt):
+    model_info = LLM_MODELS[_model]
+    model_type = model_info["type"]
+    api_key = model_info["key"]
+
+    if model_type == 1:
+        return openAI_connect_stream(_model, api_key, prompt)
+    elif model_type == 2:
+        return huggingface_connect_stream(_model, api_key, prompt)
+    raise ValueError(f"Invalid model type for {_model}")
+
+# Router that hedges slow models and fails over on errors; streams are hedged
+# on time to first token
+llm_router = HedgedRouter(
+    call=connect,
+    stream_call=connect_stream,
+    alternates={name: info["alternates"] for name, info in LLM_MODELS.items()},
+    default_hedge_after=float(os.getenv("MK_ROUTER_HEDGE_AFTER", 8.0)),
+)
+
+# Streaming version of llm_init: yields (title, ingredients, instructions, image_url)
+# each time a line of the recipe completes; image_url is None until the last update
+def llm_init_stream(_model, user_input):
+    if _model not in LLM_MODELS:
+        yield "Invalid option", "", "", None
+        return
+
+    prompt =  prompt_setup(user_input)
+
+    tokens, answered_by = llm_router.stream(_model, prompt)
+    print(f"..llm_init_stream..answered by {answered_by}")
+
+    parser = SectionParser()
+    for token in tokens:
+        parser.feed(token)
+        # Only refresh the front-end when a line has completed
+        if "\n" in token:
+            sections = parser.results()
+            yield sections["Title"], sections["Ingredients"], sections["Instructions"], None
+    parser.close()
+
+    sections = parser.results()
+    yield sections["Title"], sections["Ingredients"], sections["Instructions"], None
+    image_url = generate_image(sections["Summary"])
+    yield sections["Title"], sections["Ingredients"], sections["Instructions"], image_url
@@ -0,0 +1,338 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Requests/min and tokens/min per provider and per model; None means unlimited.
+# Model entries are checked in addition to their provider's limits.
+DEFAULT_LIMITS = {
+    "openai": {
+        "rpm": int(os.getenv("MK_OPENAI_RPM", 500)),
+        "tpm": int(os.getenv("MK_OPENAI_TPM", 200000)),
+        "max_concurrency": int(os.getenv("MK_OPENAI_CONCURRENCY", 16)),
+    },
+    "huggingface": {
+        "rpm": int(os.getenv("MK_HF_RPM", 120)),
+        "tpm": int(os.getenv("MK_HF_TPM", 100000)),
+        "max_concurrency": int(os.getenv("MK_HF_CONCURRENCY", 8)),
+    },
+    "openai/dall-e-3": {"rpm": int(os.getenv("MK_DALLE_RPM", 7)), "tpm": None},
+}
+
+
+class CircuitOpenError(Exception):
+    # Raised without calling the provider while its circuit breaker is open
+    pass
+
+
+class RateLimitTimeout(Exception):
+    # Raised when a request waited longer than its queue timeout
+    pass
+
+
+def _status(error):
+    # OpenAI SDK errors carry status_code, huggingface_hub/requests errors a response
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_rate_limited(error):
+    return _status(error) == 429
+
+
+def is_provider_failure(error):
+    # Timeouts, connection errors and 5xx count against the circuit breaker;
+    # other 4xx mean the provider is up but rejected this particular request
+    status = _status(error)
+    return status is None or status >= 500
+
+
+def retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    # Refills continuously at `per_minute / 60` units per second up to `per_minute`
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        # Seconds until `amount` is available; requests larger than the bucket wait for a full one
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive failures; after `reset_timeout`
+    # one trial request is let through (half-open) and its outcome closes or reopens it
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allow(self, now):
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half-open"
+            self.trial_in_flight = False
+        if self.state == "half-open":
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+        return self.state == "closed"
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def throttled(self):
+        # A 429 shows the provider is up but busy: it neither closes nor reopens the
+        # breaker, but a half-open trial ends, so the retry can be the next trial
+        self.trial_in_flight = False
+
+    def failure(self, now):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = now
+
+
+class _ProviderState:
+    def __init__(self, limits, breaker):
+        self.max_concurrency = limits.get("max_concurrency") or 16
+        # Adaptive concurrency limit: halved on 429, grows back by one per `limit` successes
+        self.concurrency_limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.breaker = breaker
+        self.waits = deque(maxlen=1000)
+        self.counters = {
+            "requests": 0, "throttled": 0, "retries": 0, "failures": 0, "circuit_open": 0, "queue_timeouts": 0,
+        }
+
+
+class RateLimiter:
+    """
+    Shared pacing for every outbound model call in the app.
+
+    Each call waits for capacity in the request and token buckets of both its
+    provider and its model, and for a slot under the provider's adaptive
+    concurrency limit. A 429 halves that limit and is retried with jittered
+    exponential backoff (or the server's Retry-After). Repeated failures open
+    the provider's circuit breaker, which then rejects calls immediately
+    until its reset timeout passes.
+    """
+
+    def __init__(self, limits=None, failure_threshold=5, reset_timeout=30.0, max_retries=3, queue_timeout=60.0):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._buckets = {}
+        self._providers = {}
+
+    def configure(self, name, rpm=None, tpm=None, max_concurrency=None):
+        # name is a provider ("openai") or a provider/model pair ("openai/gpt-4o-mini")
+        with self._condition:
+            self.limits[name] = {"rpm": rpm, "tpm": tpm, "max_concurrency": max_concurrency}
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if key[0] != name}
+            self._providers.pop(name, None)
+
+    def _provider(self, provider):
+        if provider not in self._providers:
+            self._providers[provider] = _ProviderState(
+                self.limits.get(provider, {}),
+                CircuitBreaker(self.failure_threshold, self.reset_timeout),
+            )
+        return self._providers[provider]
+
+    def _bucket(self, name, kind):
+        key = (name, kind)
+        if key not in self._buckets:
+            per_minute = self.limits.get(name, {}).get(kind)
+            self._buckets[key] = TokenBucket(per_minute) if per_minute else None
+        return self._buckets[key]
+
+    def _buckets_for(self, provider, model):
+        names = [provider, f"{provider}/{model}"] if model else [provider]
+        pairs = []
+        for name in names:
+            for kind in ("rpm", "tpm"):
+                bucket = self._bucket(name, kind)
+                if bucket is not None:
+                    pairs.append((kind, bucket))
+        return pairs
+
+    def _acquire(self, provider, model, tokens):
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        with self._condition:
+            state = self._provider(provider)
+            while True:
+                now = time.monotonic()
+                if not state.breaker.allow(now):
+                    state.counters["circuit_open"] += 1
+                    raise CircuitOpenError(f"{provider} circuit is open; failing fast")
+
+                wait = 0.0
+                if state.in_flight >= int(state.concurrency_limit):
+                    wait = None  # woken up by _release
+                else:
+                    for kind, bucket in self._buckets_for(provider, model):
+                        wait = max(wait, bucket.wait_time(1 if kind == "rpm" else tokens, now))
+
+                if wait == 0.0:
+                    for kind, bucket in self._buckets_for(provider, model):
+                        bucket.take(1 if kind == "rpm" else tokens)
+                    state.in_flight += 1
+                    state.counters["requests"] += 1
+                    state.waits.append(now - start)
+                    return
+
+                # Not admitted: give back a half-open trial slot so another caller can use it
+                if state.breaker.state == "half-open":
+                    state.breaker.trial_in_flight = False
+                if now >= deadline:
+                    state.counters["queue_timeouts"] += 1
+                    raise RateLimitTimeout(f"waited more than {self.queue_timeout}s for {provider} capacity")
+                self._condition.wait(timeout=min(deadline - now, wait) if wait is not None else deadline - now)
+
+    def _release(self, provider, model, reserved_tokens, used_tokens, outcome):
+        with self._condition:
+            state = self._provider(provider)
+            state.in_flight -= 1
+            if outcome == "throttled":
+                state.counters["throttled"] += 1
+                state.breaker.throttled()
+                state.concurrency_limit = max(1.0, state.concurrency_limit / 2)
+            elif outcome == "failure":
+                state.counters["failures"] += 1
+                state.breaker.failure(time.monotonic())
+            elif outcome == "client_error":
+                state.breaker.success()
+            else:
+                state.breaker.success()
+                state.concurrency_limit = min(
+                    float(state.max_concurrency), state.concurrency_limit + 1 / state.concurrency_limit
+                )
+            if used_tokens is not None and used_tokens < reserved_tokens:
+                for kind, bucket in self._buckets_for(provider, model):
+                    if kind == "tpm":
+                        bucket.refund(reserved_tokens - used_tokens)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, provider, model=None, tokens=1):
+        """
+        Hold one paced request slot; report actual usage with slot.used_tokens = n.
+
+        A 429 raised inside the block counts as throttling; timeouts, connection
+        errors and 5xx count as failures for the circuit breaker.
+        """
+        self._acquire(provider, model, tokens)
+        usage = _Usage()
+        outcome = "success"
+        try:
+            yield usage
+        except Exception as e:
+            if is_rate_limited(e):
+                outcome = "throttled"
+            elif is_provider_failure(e):
+                outcome = "failure"
+            else:
+                outcome = "client_error"
+            raise
+        finally:
+            self._release(provider, model, tokens, usage.used_tokens, outcome)
+
+    def call(self, provider, model, fn, tokens=1, usage=None):
+        """
+        Run fn() under the limiter, retrying 429s with backoff.
+
+        Args:
+            provider (str): "openai" or "huggingface".
+            model (str): Model name, for per-model limits.
+            fn (callable): Performs the request.
+            tokens (int): Tokens reserved up front (prompt estimate plus max_tokens).
+            usage (callable): Optional usage(result) -> actual tokens, to refund unused reservation.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.slot(provider, model, tokens) as slot:
+                    result = fn()
+                    if usage is not None:
+                        slot.used_tokens = usage(result)
+                    return result
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                with self._condition:
+                    self._provider(provider).counters["retries"] += 1
+                delay = retry_after(e) or min(30.0, 0.5 * 2 ** attempt)
+                time.sleep(delay * (0.5 + random.random() / 2))
+
+    def metrics(self):
+        # Queue wait time and limiter state per provider
+        report = {}
+        with self._condition:
+            for provider, state in self._providers.items():
+                waits = sorted(state.waits)
+                report[provider] = dict(state.counters)
+                report[provider].update({
+                    "breaker": state.breaker.state,
+                    "concurrency_limit": round(state.concurrency_limit, 2),
+                    "in_flight": state.in_flight,
+                    "queue_wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                    "queue_wait_p95": waits[min(int(len(waits) * 0.95), len(waits) - 1)] if waits else 0.0,
+                    "queue_wait_max": waits[-1] if waits else 0.0,
+                })
+        return report
+
+
+class _Usage:
+    def __init__(self):
+        self.used_tokens = None
+
+
+def estimate_tokens(text, max_tokens=0):
+    # Rough reservation: about four characters per token for the prompt plus the completion budget
+    return len(text) // 4 + max_tokens
+
+
+# Shared by every outbound call in the process
+rate_limiter = RateLimiter(
+    failure_threshold=int(os.getenv("MK_BREAKER_FAILURES", 5)),
+    reset_timeout=float(os.getenv("MK_BREAKER_RESET", 30.0)),
+    max_retries=int(os.getenv("MK_RATE_MAX_RETRIES", 3)),
+    queue_timeout=float(os.getenv("MK_RATE_QUEUE_TIMEOUT", 60.0)),
+)
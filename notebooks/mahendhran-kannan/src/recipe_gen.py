@@ -1,4 +1,4 @@
-from src.utils import extract_section
+from src.utils import parse_sections
 from src.prompt_setup import prompt_setup
 
 # Function to send a prompt to generate recipe
@@ -22,10 +22,11 @@ def generate_text(client, _model, input):
         
         # Extract the sections
         #title, ingredients, instructions, summary = extract_section(recipe_content)
-        title = extract_section(recipe_content, "Title") 
-        ingredients = extract_section(recipe_content, "Ingredients")
-        instructions = extract_section(recipe_content, "Instructions")
-        summary = extract_section(recipe_content, "Summary")
+        sections = parse_sections(recipe_content)
+        title = sections["Title"]
+        ingredients = sections["Ingredients"]
+        instructions = sections["Instructions"]
+        summary = sections["Summary"]
 
         
         return title, ingredients, instructions, summary   
\ No newline at end of file
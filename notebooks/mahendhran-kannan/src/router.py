@@ -0,0 +1,210 @@
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# Rolling window of recent successful latencies for one model
+class LatencyHistogram:
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def count(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(int(len(samples) * p / 100), len(samples) - 1)
+        return samples[index]
+
+
+class HedgedRouter:
+    """
+    Latency-aware router over equivalent models.
+
+    Every call goes to the requested model first. If it has not answered by
+    that model's p90 latency, a hedged duplicate is sent to the next
+    equivalent model, and whichever answers first wins; the other call is
+    cancelled (or its result discarded if it is already running). Errors fail
+    over to the next equivalent model straight away.
+
+    Streams are routed the same way on time to first token: the first model
+    to produce a token wins and the rest of the stream comes from it. An
+    error before the first token fails over; an error after it is raised to
+    the caller, since the text already shown cannot be replaced.
+
+    Args:
+        call (callable): call(model, prompt) -> text, performs one provider request.
+        alternates (dict): model name -> list of equivalent model names, in preference order.
+        default_hedge_after (float): Hedge delay in seconds until a model has enough samples.
+        min_samples (int): Latency samples needed before the p90 is trusted.
+        max_workers (int): Size of the thread pool running provider calls.
+        stream_call (callable): stream_call(model, prompt) -> iterator of tokens, for stream().
+    """
+
+    def __init__(self, call, alternates, default_hedge_after=8.0, min_samples=10, max_workers=16, stream_call=None):
+        self.call = call
+        self.stream_call = stream_call
+        self.alternates = alternates
+        self.default_hedge_after = default_hedge_after
+        self.min_samples = min_samples
+        self.histograms = {}
+        self.first_token_histograms = {}
+        self.counters = {"requests": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0, "cancelled": 0}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+    def histogram(self, model, first_token=False):
+        histograms = self.first_token_histograms if first_token else self.histograms
+        with self._lock:
+            if model not in histograms:
+                histograms[model] = LatencyHistogram()
+            return histograms[model]
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def hedge_delay(self, model, first_token=False):
+        histogram = self.histogram(model, first_token)
+        if histogram.count() < self.min_samples:
+            return self.default_hedge_after
+        return histogram.percentile(90)
+
+    def _timed_call(self, model, prompt):
+        start = time.perf_counter()
+        try:
+            result = self.call(model, prompt)
+        except Exception:
+            self.histogram(model).record_error()
+            raise
+        self.histogram(model).record(time.perf_counter() - start)
+        return result
+
+    def _first_token(self, model, prompt):
+        # Runs the stream up to its first token; the rest is read by the caller
+        start = time.perf_counter()
+        tokens = iter(self.stream_call(model, prompt))
+        try:
+            first = next(tokens, "")
+        except Exception:
+            self.histogram(model, first_token=True).record_error()
+            raise
+        self.histogram(model, first_token=True).record(time.perf_counter() - start)
+        return first, tokens
+
+    @staticmethod
+    def _close_stream(future):
+        # A losing stream that already started holds a connection and a rate limiter slot
+        if not future.cancelled() and future.exception() is None:
+            future.result()[1].close()
+
+    def _race(self, model, run, first_token=False, discard=None):
+        self._count("requests")
+        candidates = [model] + [m for m in self.alternates.get(model, []) if m != model]
+        pending = {}
+        errors = []
+
+        def launch():
+            candidate = candidates[len(pending) + len(errors)]
+            future = self._executor.submit(run, candidate)
+            pending[future] = candidate
+            return candidate, time.monotonic()
+
+        latest_model, latest_start = launch()
+        while True:
+            more_candidates = len(pending) + len(errors) < len(candidates)
+            timeout = None
+            if more_candidates:
+                timeout = max(self.hedge_delay(latest_model, first_token) - (time.monotonic() - latest_start), 0)
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                answered_by = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    errors.append(error)
+                    continue
+                # First answer wins; cancel the rest
+                for other in pending:
+                    if other.cancel():
+                        self._count("cancelled")
+                    elif discard is not None:
+                        # Runs now if it already finished, otherwise when it does
+                        other.add_done_callback(discard)
+                if answered_by != model:
+                    self._count("hedge_wins")
+                return future.result(), answered_by
+
+            if not done:
+                # The latest call passed its p90: send a hedged duplicate
+                self._count("hedges")
+                latest_model, latest_start = launch()
+            elif errors and len(pending) + len(errors) < len(candidates):
+                # Fail over right away instead of waiting for the hedge delay
+                self._count("failovers")
+                latest_model, latest_start = launch()
+            elif not pending:
+                raise errors[-1]
+
+    def complete(self, model, prompt):
+        """
+        Send prompt to model, hedging and failing over to its equivalent models.
+
+        Returns:
+            tuple: (text, model that answered)
+        """
+        return self._race(model, lambda candidate: self._timed_call(candidate, prompt))
+
+    def stream(self, model, prompt):
+        """
+        Stream prompt from model, hedging on time to first token and failing over before it.
+
+        Returns once one model has produced its first token.
+
+        Returns:
+            tuple: (iterator of tokens, model that answered)
+        """
+        (first, tokens), answered_by = self._race(
+            model, lambda candidate: self._first_token(candidate, prompt), first_token=True, discard=self._close_stream
+        )
+        return itertools.chain([first], tokens), answered_by
+
+    def stats(self):
+        report = {"counters": dict(self.counters), "models": {}}
+        with self._lock:
+            histograms = dict(self.histograms)
+        for name, histogram in histograms.items():
+            report["models"][name] = {
+                "samples": histogram.count(),
+                "errors": histogram.errors,
+                "p50": histogram.percentile(50),
+                "p90": histogram.percentile(90),
+            }
+        with self._lock:
+            first_token_histograms = dict(self.first_token_histograms)
+        for name, histogram in first_token_histograms.items():
+            report["models"].setdefault(name, {}).update({
+                "first_token_samples": histogram.count(),
+                "first_token_errors": histogram.errors,
+                "first_token_p50": histogram.percentile(50),
+                "first_token_p90": histogram.percentile(90),
+            })
+        return report
+
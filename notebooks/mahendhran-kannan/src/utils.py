@@ -22,4 +22,88 @@ def extract_section(recipe_content, section):
             section_content.append(line)            
 
     # convert the list to single string
-    return "\n".join([line for line in section_content if line]).strip()
\ No newline at end of file
+    return "\n".join([line for line in section_content if line]).strip()
+
+VALID_SECTIONS = ["Title", "Ingredients", "Instructions", "Summary"]
+
+
+# Single-pass, streaming replacement for calling extract_section once per section.
+# Gives the same result as extract_section for every section.
+class SectionParser:
+    def __init__(self, sections=VALID_SECTIONS):
+        self.sections = list(sections)
+        self.content = {section: [] for section in self.sections}
+        self.current = None
+        self.finished = set()
+        self._partial = ""
+        self._headers = [(section, f"{section}:") for section in self.sections]
+        self._first_chars = {section[:1] for section in self.sections}
+
+    def _header(self, line):
+        # Cheap first-character check before comparing header prefixes
+        if line[:1] not in self._first_chars:
+            return None
+        for section, header in self._headers:
+            if line.startswith(header):
+                return section
+        return None
+
+    def done(self):
+        return len(self.finished) == len(self.sections)
+
+    def _close_current(self, events):
+        if self.current is not None:
+            self.finished.add(self.current)
+            events.append((self.current, self.section_text(self.current)))
+            self.current = None
+
+    def _feed_line(self, line, events):
+        line = line.strip()
+        section = self._header(line)
+        if section is not None:
+            if section != self.current:
+                self._close_current(events)
+            # A section that already closed never reopens, as in extract_section
+            if section not in self.finished:
+                self.current = section
+                self.content[section].append(line.replace(f"{section}:", "").strip())
+        elif self.current is not None:
+            self.content[self.current].append(line)
+
+    def section_text(self, section):
+        return "\n".join([line for line in self.content[section] if line]).strip()
+
+    # Feed a chunk of streamed text; returns (section, text) for every section that closed
+    def feed(self, chunk):
+        events = []
+        if self.done():
+            # Every section has closed, nothing later can change the result
+            return events
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._feed_line(line, events)
+            if self.done():
+                break
+        return events
+
+    # Flush the last line; returns the events for the sections closed by it
+    def close(self):
+        events = []
+        if not self.done():
+            self._feed_line(self._partial, events)
+        self._partial = ""
+        self._close_current(events)
+        return events
+
+    # Current text of every section, including the one still being streamed
+    def results(self):
+        return {section: self.section_text(section) for section in self.sections}
+
+
+# Extract every section in a single pass
+def parse_sections(recipe_content, sections=VALID_SECTIONS):
+    parser = SectionParser(sections)
+    parser.feed(recipe_content)
+    parser.close()
+    return parser.results()
@@ -0,0 +1,106 @@
+"""
+HedgedRouter.stream: failover before the first token, hedging on time to first token.
+
+The backends are plain generators, so no network or provider SDK is needed.
+check_router.py covers complete() against local HTTP servers.
+
+Usage:
+    python -m pytest test_router.py
+"""
+import threading
+import time
+
+import pytest
+
+from src.router import HedgedRouter
+
+PRIMARY, ALTERNATE = "gpt-4o-mini", "meta-llama/Llama-3.3-70B-Instruct"
+
+
+class FakeBackends:
+    # Per-model first-token delay and failures; records which streams were closed
+    def __init__(self):
+        self.delay = {}
+        self.failing = set()
+        self.failing_after_first = set()
+        self.started = []
+        self.closed = []
+        self._lock = threading.Lock()
+
+    def stream(self, model, prompt):
+        with self._lock:
+            self.started.append(model)
+        try:
+            time.sleep(self.delay.get(model, 0.0))
+            if model in self.failing:
+                raise ConnectionError(f"{model} is down")
+            yield f"Title: from {model}\n"
+            if model in self.failing_after_first:
+                raise ConnectionError(f"{model} dropped the stream")
+            yield "Ingredients: eggs\n"
+        finally:
+            with self._lock:
+                self.closed.append(model)
+
+
+@pytest.fixture
+def backends():
+    return FakeBackends()
+
+
+def make_router(backends, hedge_after=5.0):
+    return HedgedRouter(
+        call=None,
+        stream_call=backends.stream,
+        alternates={PRIMARY: [ALTERNATE], ALTERNATE: [PRIMARY]},
+        default_hedge_after=hedge_after,
+    )
+
+
+def test_failing_primary_falls_back_to_the_next_backend(backends):
+    backends.failing.add(PRIMARY)
+    router = make_router(backends)
+
+    start = time.perf_counter()
+    tokens, answered_by = router.stream(PRIMARY, "eggs")
+    text = "".join(tokens)
+
+    assert answered_by == ALTERNATE
+    assert text == f"Title: from {ALTERNATE}\nIngredients: eggs\n"
+    # Failover does not wait for the hedge delay
+    assert time.perf_counter() - start < 1.0
+    assert backends.started == [PRIMARY, ALTERNATE]
+    assert router.counters["failovers"] == 1
+    assert router.stats()["models"][PRIMARY]["first_token_errors"] == 1
+
+
+def test_every_backend_failing_raises_the_last_error(backends):
+    backends.failing.update([PRIMARY, ALTERNATE])
+    with pytest.raises(ConnectionError, match=ALTERNATE):
+        make_router(backends).stream(PRIMARY, "eggs")
+
+
+def test_slow_first_token_is_hedged_and_the_loser_is_closed(backends):
+    backends.delay[PRIMARY] = 0.5
+    router = make_router(backends, hedge_after=0.05)
+
+    tokens, answered_by = router.stream(PRIMARY, "eggs")
+    assert answered_by == ALTERNATE
+    assert "".join(tokens).startswith(f"Title: from {ALTERNATE}")
+    assert router.counters["hedges"] == 1
+
+    # The primary's stream is closed once its first token arrives, releasing its slot
+    deadline = time.monotonic() + 2.0
+    while PRIMARY not in backends.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert PRIMARY in backends.closed
+
+
+def test_error_after_the_first_token_is_raised(backends):
+    # Text already shown cannot be replaced by another model's answer
+    backends.failing_after_first.add(PRIMARY)
+    tokens, answered_by = make_router(backends).stream(PRIMARY, "eggs")
+    assert answered_by == PRIMARY
+    assert next(tokens) == f"Title: from {PRIMARY}\n"
+    with pytest.raises(ConnectionError, match="dropped"):
+        next(tokens)
@@ -17,6 +17,7 @@ from src.helper import parse_json_markdown
 from src.helper import convert_to_md
 from src.helper import get_chat_llm
 from src.helper import get_image_llm
+from src.request_profiler import request_profiler
 
 import os
 
@@ -55,7 +56,13 @@ def getRecipeImage(model_name, api_key, recipeDetails):
         print(f"An unexpected error occurred: {e}")
         return ""
 
-def getRecipe(user_prompt, history, model_name, api_key, image_model_name, image_api_key):
+def getRecipe(user_prompt, history, model_name, api_key, image_model_name, image_api_key, profile=None):
+
+    # profile=True/False forces profiling on or off; None leaves it to RECIPE_PROFILE_RATE
+    with request_profiler.profile("getRecipe", force=profile):
+        return _getRecipe(user_prompt, history, model_name, api_key, image_model_name, image_api_key)
+
+def _getRecipe(user_prompt, history, model_name, api_key, image_model_name, image_api_key):
 
     recipe_out_parser = PydanticOutputParser(pydantic_object=Recipe)
     history_langchain_format = []
@@ -95,7 +102,7 @@ def getRecipe(user_prompt, history, model_name, api_key, image_model_name, image
 
     return convert_to_md(outputRecipe, recipeImageURL)
 
-def predict(message, history, model_name, api_key, image_model_name, image_api_key):
+def predict(message, history, model_name, api_key, image_model_name, image_api_key, request: gr.Request = None):
     history_langchain_format = []
     history_langchain_format.append(SystemMessage(SYSTEM_PROMPT))
     for msg in history:
@@ -104,7 +111,10 @@ def predict(message, history, model_name, api_key, image_model_name, image_api_k
         elif msg['role'] == "assistant":
             history_langchain_format.append(AIMessage(content=msg['content']))
     history_langchain_format.append(HumanMessage(content=message))
-    llm_response = getRecipe(message, history, model_name, api_key, image_model_name, image_api_key)
+    # With RECIPE_PROFILE_QUERY=1, ?profile=1 in the page URL profiles this message
+    # (see src/request_profiler.py)
+    profile = request_profiler.from_query(request.query_params.get("profile")) if request is not None else None
+    llm_response = getRecipe(message, history, model_name, api_key, image_model_name, image_api_key, profile)
     return llm_response
 
 
@@ -0,0 +1,120 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class _Request:
+    def __init__(self, prompt, kwargs):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        # Only requests with identical generation settings can share a batch
+        self.group = repr(sorted(kwargs.items()))
+        self.future = Future()
+
+
+class BatchingGenerator:
+    """
+    Dynamic batching scheduler in front of a transformers text-generation pipeline.
+
+    Concurrent calls to generate() are queued; a single worker thread collects
+    them for up to `max_wait_ms` or until `max_batch_size` prompts are waiting,
+    runs them through the pipeline as one padded batch and hands each caller
+    its own result.
+    """
+
+    def __init__(self, generator, max_batch_size=8, max_wait_ms=20):
+        self.generator = generator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches_run = 0
+        self.requests_served = 0
+
+        # Decoder-only models need a pad token and left padding to batch prompts
+        tokenizer = generator.tokenizer
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run_forever, name="generation-batcher", daemon=True)
+        self._worker.start()
+
+    def generate(self, prompt, **kwargs):
+        """
+        Generate text for one prompt, sharing a batch with concurrent callers.
+
+        Accepts the same keyword arguments as the pipeline and returns the same
+        result as generator(prompt, **kwargs).
+        """
+        request = _Request(prompt, kwargs)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_forever(self):
+        while True:
+            groups = {}
+            for request in self._collect():
+                groups.setdefault(request.group, []).append(request)
+            for requests in groups.values():
+                self._run_batch(requests)
+
+    def _run_batch(self, requests):
+        try:
+            outputs = self.generator(
+                [request.prompt for request in requests],
+                batch_size=len(requests),
+                **requests[0].kwargs
+            )
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.requests_served += len(requests)
+        for request, output in zip(requests, outputs):
+            request.future.set_result(output)
+
+    def stats(self):
+        return {
+            "batches_run": self.batches_run,
+            "requests_served": self.requests_served,
+            "mean_batch_size": self.requests_served / self.batches_run if self.batches_run else 0.0,
+        }
+
+
+_lock = threading.Lock()
+_batcher = None
+
+
+def get_batcher(generator):
+    """
+    Return the process-wide batcher for the resident pipeline.
+
+    The batch window and size are read from RECIPE_BATCH_WAIT_MS and
+    RECIPE_BATCH_MAX_SIZE.
+    """
+    global _batcher
+    with _lock:
+        if _batcher is None:
+            _batcher = BatchingGenerator(
+                generator,
+                max_batch_size=int(os.getenv("RECIPE_BATCH_MAX_SIZE", 8)),
+                max_wait_ms=float(os.getenv("RECIPE_BATCH_WAIT_MS", 20)),
+            )
+    return _batcher
@@ -0,0 +1,67 @@
+"""
+Compare batched and unbatched local generation throughput.
+
+Each simulated user sends the same number of recipe prompts back to back.
+Unbatched mode calls the pipeline directly from every user thread, as the app
+did before; batched mode goes through BatchingGenerator. Every request
+generates exactly --new-tokens tokens, so tokens/s is directly comparable.
+
+Usage:
+    python bench_batching.py --model tiiuae/falcon-7b-instruct --users 1 4 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from transformers import pipeline
+
+from batching import BatchingGenerator
+from model_residency import MODEL_NAME
+
+INGREDIENTS = ["tomato, chicken, garlic", "rice, egg, scallion", "tofu, soy sauce, noodles", "oats, milk, banana"]
+
+
+def run(generate, users, requests_per_user, new_tokens):
+    def user(index):
+        for i in range(requests_per_user):
+            ingredients = INGREDIENTS[(index + i) % len(INGREDIENTS)]
+            generate(
+                f"You are a world-class chef. Create a recipe with: {ingredients}.",
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+            )
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    elapsed = time.perf_counter() - start
+    return users * requests_per_user * new_tokens / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-user", type=int, default=2)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    generator = pipeline("text-generation", model=args.model, tokenizer=args.model)
+    batcher = BatchingGenerator(generator, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    def unbatched(prompt, **kwargs):
+        return generator(prompt, **kwargs)
+
+    print(f"{'users':>5} {'unbatched tok/s':>16} {'batched tok/s':>14} {'speedup':>8}")
+    for users in args.users:
+        plain = run(unbatched, users, args.requests_per_user, args.new_tokens)
+        batched = run(batcher.generate, users, args.requests_per_user, args.new_tokens)
+        print(f"{users:>5} {plain:>16.1f} {batched:>14.1f} {batched / plain:>7.2f}x")
+    print("batcher:", batcher.stats())
+
+
+if __name__ == "__main__":
+    main()
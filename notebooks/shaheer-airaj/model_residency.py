@@ -0,0 +1,67 @@
+import os
+import resource
+import threading
+import time
+
+from transformers import pipeline
+
+MODEL_NAME = "tiiuae/falcon-7b-instruct"
+
+# Streamlit re-executes the app script on every interaction, but imported
+# modules are kept in sys.modules, so state held here lives for the process.
+_lock = threading.Lock()
+_generator = None
+_stats = {}
+
+
+def _resident_memory_mb():
+    # Current RSS on Linux, peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_generator(model_name=MODEL_NAME):
+    """
+    Return the process-wide text-generation pipeline, loading it on first use.
+
+    The first call loads the model and runs a short dummy generation so that
+    lazy initialisation happens before the first user request. Every later call,
+    from any session or rerun, returns the same resident pipeline.
+    """
+    global _generator
+    if _generator is not None:
+        return _generator
+
+    with _lock:
+        if _generator is None:
+            memory_before = _resident_memory_mb()
+            start = time.perf_counter()
+            generator = pipeline("text-generation", model=model_name, tokenizer=model_name)
+            load_seconds = time.perf_counter() - start
+
+            # Warm up kernels and caches with a tiny generation
+            start = time.perf_counter()
+            generator("Hello", max_new_tokens=1, do_sample=False)
+            warmup_seconds = time.perf_counter() - start
+
+            _stats.update({
+                "model": model_name,
+                "load_seconds": load_seconds,
+                "warmup_seconds": warmup_seconds,
+                "model_memory_mb": _resident_memory_mb() - memory_before,
+            })
+            _generator = generator
+    return _generator
+
+
+def residency_stats():
+    """Report load time, warm-up time and resident memory of the loaded model."""
+    stats = dict(_stats)
+    stats["loaded"] = _generator is not None
+    stats["resident_memory_mb"] = _resident_memory_mb()
+    return stats
+
@@ -0,0 +1,162 @@
+"""
+Shared-prefix KV cache for the fixed chef instructions.
+
+Every recipe prompt starts with the same instructions and only the ingredient
+list changes, so the attention keys/values for the instructions are computed
+once and copied into each request. The forward pass then only runs on the
+ingredient suffix and the generated tokens.
+
+The app only uses this path with RECIPE_PREFIX_CACHE=1. It is off by default
+because the default path batches concurrent users through batching.py, and
+padded batches cannot share one prefix cache. Each request here runs its own
+generate() on its own copy of the cache. That saves the prefix prefill, but
+concurrent users no longer share forward passes, so it only pays off at low
+concurrency.
+
+test_prefix_cache.py checks that cached and uncached greedy generation agree
+on a tiny random model, and checks the prefix/suffix handling against a fake
+model that needs only torch. Run this file to check the same on a real model
+and time the prefill:
+    python prefix_cache.py --model tiiuae/falcon-7b-instruct
+"""
+import argparse
+import copy
+import threading
+import time
+
+import torch
+
+# Constant part of every prompt; the ingredients are appended after it
+CHEF_PREFIX = """
+    You are a world-class chef. Based on the following ingredients, create a unique recipe.
+    Provide:
+    1. A title for the recipe.
+    2. A list of ingredients (with quantities).
+    3. Step-by-step instructions to prepare the dish.
+    Ingredients:"""
+
+
+def chef_suffix(ingredients):
+    # Variable part of the prompt
+    return f" {ingredients}.\n"
+
+
+class PrefixCachedGenerator:
+    """
+    Generate from a fixed prompt prefix whose KV cache is computed once.
+
+    The prompt is always tokenized as prefix ids followed by suffix ids, for
+    both the cached and uncached paths, so the two produce the same sequence.
+    `cache` is the empty cache the prefix is prefilled into, a DynamicCache by
+    default.
+    """
+
+    def __init__(self, model, tokenizer, prefix=CHEF_PREFIX, cache=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.prefix = prefix
+        self.prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+
+        start = time.perf_counter()
+        if cache is None:
+            from transformers import DynamicCache
+            cache = DynamicCache()
+        with torch.no_grad():
+            self.prefix_cache = cache
+            model(self.prefix_ids, past_key_values=self.prefix_cache, use_cache=True)
+        self.prefill_seconds = time.perf_counter() - start
+
+    def build_input_ids(self, suffix):
+        suffix_ids = self.tokenizer(suffix, return_tensors="pt", add_special_tokens=False).input_ids
+        return torch.cat([self.prefix_ids, suffix_ids.to(self.model.device)], dim=-1)
+
+    def generate(self, suffix, use_prefix_cache=True, **generate_kwargs):
+        """
+        Generate a completion for prefix + suffix.
+
+        Args:
+            suffix (str): The variable end of the prompt.
+            use_prefix_cache (bool): Reuse the precomputed prefix KV cache (default is True).
+            **generate_kwargs: Passed through to model.generate.
+
+        Returns:
+            str: The prompt followed by the generated text, like the pipeline's generated_text.
+        """
+        input_ids = self.build_input_ids(suffix)
+        if use_prefix_cache:
+            # generate() extends the cache in place, so every request gets its own copy
+            generate_kwargs["past_key_values"] = copy.deepcopy(self.prefix_cache)
+        generate_kwargs.setdefault("pad_token_id", self.tokenizer.eos_token_id)
+
+        with torch.no_grad():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                **generate_kwargs
+            )
+        return self.tokenizer.decode(output[0], skip_special_tokens=True)
+
+
+_lock = threading.Lock()
+_prefix_generator = None
+
+
+def get_prefix_generator(generator):
+    """Return the process-wide prefix-cached generator for the resident pipeline."""
+    global _prefix_generator
+    with _lock:
+        if _prefix_generator is None:
+            _prefix_generator = PrefixCachedGenerator(generator.model, generator.tokenizer)
+    return _prefix_generator
+
+
+def check_matches_uncached(prefix_generator, suffixes, max_new_tokens=32):
+    """
+    Check that greedy generation with the prefix cache matches generation without it.
+
+    Returns:
+        list: (suffix, cached_text, uncached_text) for every suffix that differs.
+    """
+    mismatches = []
+    for suffix in suffixes:
+        cached = prefix_generator.generate(suffix, max_new_tokens=max_new_tokens, do_sample=False)
+        uncached = prefix_generator.generate(
+            suffix, use_prefix_cache=False, max_new_tokens=max_new_tokens, do_sample=False
+        )
+        if cached != uncached:
+            mismatches.append((suffix, cached, uncached))
+    return mismatches
+
+
+def main():
+    from transformers import pipeline
+    from model_residency import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    generator = pipeline("text-generation", model=args.model, tokenizer=args.model)
+    prefix_generator = PrefixCachedGenerator(generator.model, generator.tokenizer)
+    suffixes = [chef_suffix(ingredients) for ingredients in
+                ["tomato, chicken, garlic", "rice, egg, scallion", "tofu", "oats, milk, banana, honey, cinnamon"]]
+
+    mismatches = check_matches_uncached(prefix_generator, suffixes, args.max_new_tokens)
+    for suffix, cached, uncached in mismatches:
+        print(f"MISMATCH for {suffix!r}:\n  cached:   {cached!r}\n  uncached: {uncached!r}")
+
+    # Prefill timing: full prompt versus suffix only
+    for use_prefix_cache in (False, True):
+        start = time.perf_counter()
+        for suffix in suffixes:
+            prefix_generator.generate(suffix, use_prefix_cache=use_prefix_cache, max_new_tokens=1, do_sample=False)
+        label = "cached prefix" if use_prefix_cache else "full prompt"
+        print(f"{label:>13}: {(time.perf_counter() - start) / len(suffixes) * 1000:.1f} ms per prefill")
+
+    print("OK" if not mismatches else f"{len(mismatches)} mismatches")
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,37 @@
-from transformers import pipeline
+import os
 import streamlit as st
+from model_residency import get_generator, residency_stats
+from batching import get_batcher
+from prefix_cache import CHEF_PREFIX, chef_suffix, get_prefix_generator
+from stopping import MAX_NEW_TOKENS, recipe_stopping_criteria
 
-# Load the pre-trained model pipeline (using a Hugging Face hosted model)
-generator = pipeline("text-generation", model="tiiuae/falcon-7b-instruct", tokenizer="tiiuae/falcon-7b-instruct")
+# Load the pre-trained model pipeline once per process (using a Hugging Face hosted model)
+generator = get_generator()
+
+# Concurrent users share padded batches instead of queueing one at a time.
+# With RECIPE_PREFIX_CACHE=1 each request instead reuses the precomputed KV cache
+# of the fixed chef instructions, which suits low concurrency better.
+USE_PREFIX_CACHE = os.getenv("RECIPE_PREFIX_CACHE", "0") == "1"
+if USE_PREFIX_CACHE:
+    prefix_generator = get_prefix_generator(generator)
+else:
+    batcher = get_batcher(generator)
 
 def generate_recipe(ingredients):
-    # Prompt engineering
-    prompt = f"""
-    You are a world-class chef. Based on the following ingredients, create a unique recipe:
-    Ingredients: {ingredients}.
-    Provide:
-    1. A title for the recipe.
-    2. A list of ingredients (with quantities).
-    3. Step-by-step instructions to prepare the dish.
-    """
-    
-    # Generate recipe
-    response = generator(prompt, max_length=300, temperature=0.8, num_return_sequences=1)
+    # Prompt engineering: fixed instructions first, ingredients last
+    suffix = chef_suffix(ingredients)
+
+    # Generate recipe: the budget counts new tokens only, and generation stops
+    # as soon as the last instruction step is complete
+    generation_args = {
+        "max_new_tokens": MAX_NEW_TOKENS,
+        "temperature": 0.8,
+        "num_return_sequences": 1,
+        "stopping_criteria": recipe_stopping_criteria(generator.tokenizer),
+    }
+    if USE_PREFIX_CACHE:
+        return prefix_generator.generate(suffix, **generation_args)
+    response = batcher.generate(CHEF_PREFIX + suffix, **generation_args)
     return response[0]["generated_text"]
 
 # Streamlit app setup
@@ -33,5 +48,12 @@ if st.button("Generate Recipe"):
     st.success("Here is your recipe:")
     st.text(recipe)
 
+# Model residency
+stats = residency_stats()
+st.caption(
+    f"Model loaded in {stats['load_seconds']:.1f}s (warm-up {stats['warmup_seconds']:.1f}s), "
+    f"resident memory {stats['resident_memory_mb']:.0f} MB"
+)
+
 # Footer
 st.write("Built with 💖 using Generative AI!")
@@ -0,0 +1,97 @@
+import os
+import re
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+# Budget for generated tokens only; the prompt no longer counts against it
+MAX_NEW_TOKENS = int(os.getenv("RECIPE_MAX_NEW_TOKENS", 400))
+
+SECTION_HEADERS = {
+    "title": re.compile(r"^[#*\s]*(recipe\s+)?(title|name)\b", re.IGNORECASE),
+    "ingredients": re.compile(r"^[#*\s]*ingredients\b", re.IGNORECASE),
+    "instructions": re.compile(
+        r"^[#*\s]*(step[- ]by[- ]step\s+)?(instructions|directions|method|preparation|steps)\b", re.IGNORECASE
+    ),
+}
+STEP_LINE = re.compile(r"^(\d+\s*[.):]|step\s*\d+|[-*•])", re.IGNORECASE)
+
+
+def recipe_sections(text):
+    """
+    Track the recipe structure in the completed lines of generated text.
+
+    Args:
+        text (str): The generated text so far (without the prompt).
+
+    Returns:
+        tuple: (sections, done) where sections lists the headers seen in order and
+        done is True once the instruction steps are followed by another section
+        or by a separate paragraph that is not a step.
+    """
+    sections = []
+    steps = 0
+    after_blank = False
+    # The last line may still be growing, so only completed lines are inspected
+    for line in text.split("\n")[:-1]:
+        line = line.strip()
+        header = next((name for name, pattern in SECTION_HEADERS.items() if pattern.match(line)), None)
+        if header is not None:
+            if sections and sections[-1] == "instructions" and steps:
+                return sections, True
+            sections.append(header)
+            steps = 0
+            continue
+        if not sections or sections[-1] != "instructions":
+            continue
+        if not line:
+            after_blank = True
+            continue
+        if STEP_LINE.match(line):
+            steps += 1
+        elif steps and after_blank:
+            # A paragraph after the last step ("Enjoy!", "Serves 4", ...); lines
+            # directly below a step are treated as its continuation
+            return sections, True
+        after_blank = False
+    return sections, False
+
+
+class RecipeSectionStopper(StoppingCriteria):
+    """
+    Stop generation as soon as the last instruction step of the recipe is complete.
+
+    Works for batched generation: each row is tracked separately and finished
+    rows are reported individually. The prompt length is taken from the first
+    call, when exactly one token has been generated.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.prompt_length = None
+        self.done = None
+
+    def __repr__(self):
+        # Constant, so requests that only differ by their stopper can share a batch
+        return "RecipeSectionStopper()"
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1] - 1
+            self.done = [False] * input_ids.shape[0]
+
+        for row in range(input_ids.shape[0]):
+            if self.done[row]:
+                continue
+            # A line can only complete when the newest token contains a newline
+            if "\n" not in self.tokenizer.decode(input_ids[row, -1:]):
+                continue
+            text = self.tokenizer.decode(input_ids[row, self.prompt_length:], skip_special_tokens=True)
+            self.done[row] = recipe_sections(text)[1]
+
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+
+def recipe_stopping_criteria(tokenizer):
+    """Build a fresh stopping criteria list for one generate call."""
+    return StoppingCriteriaList([RecipeSectionStopper(tokenizer)])
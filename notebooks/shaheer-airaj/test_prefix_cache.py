@@ -0,0 +1,112 @@
+"""
+Cached and uncached greedy generation must agree.
+
+Uses a tiny randomly initialised GPT-2 and a byte-level tokenizer, so nothing
+is downloaded; those tests are skipped when transformers cannot be imported.
+The prefix/suffix handling is also checked against a fake model that needs
+only torch.
+
+Usage:
+    python -m pytest test_prefix_cache.py
+"""
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch", exc_type=ImportError)
+
+from prefix_cache import CHEF_PREFIX, PrefixCachedGenerator, chef_suffix, check_matches_uncached  # noqa: E402
+
+
+class ByteTokenizer:
+    # One token per UTF-8 byte; id 0 is end of sequence
+    eos_token_id = 0
+
+    def __call__(self, text, return_tensors="pt", add_special_tokens=True):
+        return SimpleNamespace(input_ids=torch.tensor([[byte + 1 for byte in text.encode("utf-8")]]))
+
+    def decode(self, ids, skip_special_tokens=True):
+        return bytes(i - 1 for i in ids.tolist() if i > 0).decode("utf-8", errors="replace")
+
+
+class FakeCache:
+    # Remembers the token ids it holds keys/values for
+    def __init__(self):
+        self.ids = []
+
+    def get_seq_length(self):
+        return len(self.ids)
+
+
+class FakeModel:
+    """
+    Greedy "model" whose next token depends on every token before it.
+
+    Like generate() with past_key_values, it only runs the part of input_ids
+    that the cache does not hold yet, and extends the cache in place.
+    """
+
+    device = torch.device("cpu")
+
+    def __init__(self):
+        self.forward_lengths = []
+
+    def __call__(self, input_ids, past_key_values, use_cache=True):
+        self.forward_lengths.append(input_ids.shape[-1])
+        past_key_values.ids += input_ids[0].tolist()
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, pad_token_id, past_key_values=None, do_sample=False):
+        assert attention_mask.shape == input_ids.shape
+        ids = input_ids[0].tolist()
+        cached = past_key_values.ids if past_key_values is not None else []
+        assert ids[:len(cached)] == cached, "cache does not match the start of the prompt"
+        self.forward_lengths.append(len(ids) - len(cached))
+        for _ in range(max_new_tokens):
+            ids.append(sum(ids) % 200 + 32)
+        if past_key_values is not None:
+            past_key_values.ids = ids[:-1]
+        return torch.tensor([ids])
+
+
+def test_prompt_is_prefix_ids_then_suffix_ids():
+    generator = PrefixCachedGenerator(FakeModel(), ByteTokenizer(), cache=FakeCache())
+    suffix = chef_suffix("tofu")
+    expected = [byte + 1 for byte in (CHEF_PREFIX + suffix).encode("utf-8")]
+    assert generator.build_input_ids(suffix)[0].tolist() == expected
+
+
+def test_prefix_is_prefilled_once_and_copied_per_request():
+    model = FakeModel()
+    generator = PrefixCachedGenerator(model, ByteTokenizer(), cache=FakeCache())
+    prefix_length = len(CHEF_PREFIX.encode("utf-8"))
+    assert generator.prefix_cache.get_seq_length() == prefix_length
+
+    suffixes = [chef_suffix(ingredients) for ingredients in ["rice, egg", "tofu", "rice, egg"]]
+    assert check_matches_uncached(generator, suffixes, max_new_tokens=8) == []
+    # Prefill, then per suffix: the cached run only sees the suffix, the uncached one the whole prompt
+    for suffix, (cached, uncached) in zip(suffixes, zip(model.forward_lengths[1::2], model.forward_lengths[2::2])):
+        assert cached == len(suffix.encode("utf-8"))
+        assert uncached == prefix_length + cached
+    assert generator.prefix_cache.get_seq_length() == prefix_length
+
+
+@pytest.fixture(scope="module")
+def prefix_generator():
+    transformers = pytest.importorskip("transformers", exc_type=ImportError)
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=257, n_positions=512, n_embd=64, n_layer=2, n_head=2)
+    model = transformers.GPT2LMHeadModel(config).eval()
+    return PrefixCachedGenerator(model, ByteTokenizer())
+
+
+def test_cached_generation_matches_uncached(prefix_generator):
+    suffixes = [chef_suffix(ingredients) for ingredients in ["tomato, chicken, garlic", "tofu", "oats, milk, banana"]]
+    assert check_matches_uncached(prefix_generator, suffixes, max_new_tokens=16) == []
+
+
+def test_requests_do_not_extend_the_shared_prefix_cache(prefix_generator):
+    prefix_length = prefix_generator.prefix_cache.get_seq_length()
+    first = prefix_generator.generate(chef_suffix("rice, egg"), max_new_tokens=8, do_sample=False)
+    second = prefix_generator.generate(chef_suffix("rice, egg"), max_new_tokens=8, do_sample=False)
+    assert first == second
+    assert prefix_generator.prefix_cache.get_seq_length() == prefix_length
@@ -0,0 +1,71 @@
+"""
+Benchmark the nutrition chart engine under parallel load.
+
+Renders charts from a thread pool and reports per-chart latency percentiles,
+peak Python allocations and process RSS, for both uncached renders (every
+request has a distinct macro tuple) and memoized renders (repeated tuples).
+
+Usage:
+    python bench_piechart.py --charts 200 --workers 8
+"""
+import argparse
+import resource
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from piechart import create_nutrition_pie_chart, render_nutrition_pie_chart
+
+
+def run(charts, workers, distinct):
+    render_nutrition_pie_chart.cache_clear()
+    # Distinct tuples force a render every time; a small set exercises the memo
+    inputs = [
+        {"protein": 10 + i % distinct, "carbohydrates": 40, "fats": 15}
+        for i in range(charts)
+    ]
+
+    def timed(nutrition_info):
+        start = time.perf_counter()
+        create_nutrition_pie_chart(nutrition_info)
+        return time.perf_counter() - start
+
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = sorted(pool.map(timed, inputs))
+    wall = time.perf_counter() - wall_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "charts": charts,
+        "workers": workers,
+        "distinct": distinct,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "charts_per_s": charts / wall,
+        "peak_alloc_mb": peak / 1024 / 1024,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--charts", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    for distinct in (args.charts, 5):
+        result = run(args.charts, args.workers, distinct)
+        print(
+            f"distinct={result['distinct']:>5} workers={result['workers']:>3} "
+            f"p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+            f"throughput={result['charts_per_s']:.1f}/s "
+            f"peak_alloc={result['peak_alloc_mb']:.1f}MB max_rss={result['max_rss_mb']:.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
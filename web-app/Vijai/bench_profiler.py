@@ -0,0 +1,124 @@
+"""
+Overhead of the request profiler, disabled and enabled.
+
+The workload is the CPU side of one run_app request with the network taken
+out. A canned GPT response is fed token by token through the incremental JSON
+parser, then build_output runs, then the nutrition chart is rendered without
+the memo. Each mode runs the same workload:
+
+    bare          no profiler
+    disabled      inside profile() with sample rate 0 (the production default)
+    sampled       sample rate --rate, stack sampling only
+    stacks        every request profiled, stack sampling only
+    stacks+alloc  every request profiled, stack sampling and tracemalloc
+
+The cost of a disabled profile() call is also measured on an empty body.
+Profiles go to a temporary directory.
+
+Importing recipe_generator needs OPENAI_API_KEY set; no request is sent.
+
+Usage:
+    OPENAI_API_KEY=unused python bench_profiler.py --requests 40 --rate 0.1
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+from piechart import render_nutrition_pie_chart
+from recipe_generator import build_output
+from request_profiler import RequestProfiler
+from stream_parser import IncrementalJSONParser
+
+RESPONSE = json.dumps({
+    "recipe_details": {
+        "title": "Garlic Chicken with Rice",
+        "ingredients": [f"{i} cups of ingredient number {i}" for i in range(1, 25)],
+        "instructions": [f"Step {i}: stir, season and simmer for {i} minutes." for i in range(1, 25)],
+    },
+    "image_prompt": "A plate of garlic chicken over rice with herbs",
+    "ingredient_suggestions": ["Lemon", "Parsley", "Chili flakes"],
+    "nutrition_info": {"calories": "640 kcal", "protein": "42 g", "carbohydrates": "70 g", "fats": "18 g"},
+}, indent=2)
+
+
+def workload():
+    parser = IncrementalJSONParser()
+    structured_response = None
+    for start in range(0, len(RESPONSE), 4):  # about one token per 4 characters
+        for path, value in parser.feed(RESPONSE[start:start + 4]):
+            if path == ():
+                structured_response = value
+    output = build_output(structured_response)
+    macros = {key: int(value.split()[0]) for key, value in output["nutrition_info"].items() if key != "calories"}
+    render_nutrition_pie_chart.__wrapped__(macros["protein"], macros["carbohydrates"], macros["fats"])
+
+
+def measure(requests, run):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=0.1, help="sample rate of the sampled mode")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between stack samples")
+    parser.add_argument("--calls", type=int, default=200000, help="calls for the disabled per-call cost")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="profiles-")
+    disabled = RequestProfiler(sample_rate=0.0, output_dir=output_dir)
+    sampled = RequestProfiler(sample_rate=args.rate, interval=args.interval, output_dir=output_dir)
+    stacks = RequestProfiler(interval=args.interval, output_dir=output_dir)
+    both = RequestProfiler(interval=args.interval, output_dir=output_dir, allocations=True)
+
+    def under(profiler, force=None):
+        def run():
+            with profiler.profile("bench", force=force):
+                workload()
+        return run
+
+    modes = [
+        ("bare", workload),
+        ("disabled", under(disabled)),
+        ("sampled", under(sampled)),
+        ("stacks", under(stacks, force=True)),
+        ("stacks+alloc", under(both, force=True)),
+    ]
+
+    for _ in range(5):  # warm-up: imports, font cache, allocator
+        workload()
+    bare = None
+    for name, run in modes:
+        latencies = measure(args.requests, run)
+        p50 = statistics.median(latencies)
+        mean = statistics.mean(latencies)
+        bare = bare or (p50, mean)
+        print(
+            f"{name:>13}: p50 {p50 * 1000:7.2f} ms ({(p50 / bare[0] - 1) * 100:+6.1f}%)"
+            f" | mean {mean * 1000:7.2f} ms ({(mean / bare[1] - 1) * 100:+6.1f}%)"
+        )
+    print(f"sampled mode profiled {sampled.stats()['profiled']} of {args.requests} requests")
+
+    # Per-call cost of profile() when the request is not sampled
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        pass
+    empty = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        with disabled.profile("bench"):
+            pass
+    per_call = (time.perf_counter() - start - empty) / args.calls
+    print(f"disabled profile() call: {per_call * 1e6:.2f} us")
+    print(f"profiles written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
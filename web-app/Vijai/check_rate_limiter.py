@@ -0,0 +1,90 @@
+"""
+Walk the rate limiter's circuit breaker through its states with fake provider errors.
+
+No network is used. The breaker is opened with 503s. After the reset timeout
+the half-open trial is answered with a 429, then with a 503, and finally with
+a success. A throttled trial must not wedge the breaker in half-open: the
+retry after it has to be let through as the next trial.
+
+Usage:
+    python check_rate_limiter.py
+"""
+import json
+import time
+
+from rate_limiter import CircuitOpenError, RateLimiter
+
+
+class FakeProviderError(Exception):
+    # Looks like an OpenAI SDK error to the limiter
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def fail(status_code):
+    def fn():
+        raise FakeProviderError(status_code)
+    return fn
+
+
+def expect(error_type, fn):
+    try:
+        fn()
+    except error_type:
+        return
+    raise AssertionError(f"expected {error_type.__name__}")
+
+
+def main():
+    reset_timeout = 0.05
+    limiter = RateLimiter(limits={}, failure_threshold=2, reset_timeout=reset_timeout, max_retries=1)
+    breaker = lambda: limiter.metrics()["openai"]["breaker"]
+
+    # Two 503s open the breaker; calls then fail fast
+    for _ in range(2):
+        expect(FakeProviderError, lambda: limiter.call("openai", None, fail(503)))
+    assert breaker() == "open", breaker()
+    expect(CircuitOpenError, lambda: limiter.call("openai", None, lambda: "ok"))
+    print("opened after 2 failures")
+
+    # 429 on the half-open trial and on its retry: the next call is the next trial,
+    # not CircuitOpenError
+    time.sleep(reset_timeout * 1.5)
+    expect(FakeProviderError, lambda: limiter.call("openai", None, fail(429)))
+    assert breaker() == "half-open", breaker()
+    assert limiter.call("openai", None, lambda: "ok") == "ok"
+    assert breaker() == "closed", breaker()
+    print("429 on trial and retry: next call admitted as trial, breaker closed")
+
+    # 429 on the trial, success on the retry: the retry is admitted and closes the breaker
+    for _ in range(2):
+        expect(FakeProviderError, lambda: limiter.call("openai", None, fail(503)))
+    time.sleep(reset_timeout * 1.5)
+    attempts = []
+
+    def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FakeProviderError(429)
+        return "ok"
+
+    assert limiter.call("openai", None, throttled_once) == "ok", attempts
+    assert breaker() == "closed", breaker()
+    print("429 on trial with retry: retry admitted, breaker closed")
+
+    # 503 on the half-open trial reopens the breaker
+    for _ in range(2):
+        expect(FakeProviderError, lambda: limiter.call("openai", None, fail(503)))
+    time.sleep(reset_timeout * 1.5)
+    expect(FakeProviderError, lambda: limiter.call("openai", None, fail(503)))
+    assert breaker() == "open", breaker()
+    expect(CircuitOpenError, lambda: limiter.call("openai", None, lambda: "ok"))
+    print("503 on trial: reopened")
+
+    print(json.dumps(limiter.metrics(), indent=2))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,64 @@
+import base64
+import urllib.request
+
 from __init__ import client  # Import the OpenAI client from __init__.py
 #from __init__ import init_client_openaikey
+from image_store import image_store, image_key
+from rate_limiter import rate_limiter
+from telemetry import telemetry
 
 
-def generate_image(image_prompt, num_images=1, image_size="1024x1024"):
+def generate_image(image_prompt, num_images=1, image_size="1024x1024", image_model="dall-e-2"):
     """
     Generate an image using the DALL·E API.
 
+    Images are kept in the local image store, so a repeated prompt is served
+    from disk instead of being generated and downloaded again.
+
     Args:
         image_prompt (str): The prompt describing the image to generate.
         num_images (int): The number of images to generate (default is 1).
         image_size (str): The resolution of the generated image (default is "1024x1024").
+        image_model (str): The DALL·E model to use (default is "dall-e-2").
 
     Returns:
-        list: A list of URLs for the generated images.
+        list: A list of PNG images as bytes.
     """
-    try:
-        # Call the OpenAI API to generate images
-        # init_client_openaikey()
-        response = client.images.generate(
-            prompt=image_prompt,
-            n=num_images,  # Number of images to generate
-            size=image_size  # Image resolution
-        )
-
-        # Extract and return all image URLs
-        image_urls = [data.url for data in response.data]
-        return image_urls
-
-    except Exception as e:
-        # Handle errors gracefully
-        print(f"Error generating image: {e}")
-        raise RuntimeError(f"Failed to generate image: {e}")
\ No newline at end of file
+    with telemetry.span("image", model=image_model, size=image_size, images=num_images):
+        keys = [image_key(image_prompt, image_model, image_size, index) for index in range(num_images)]
+        cached_images = [image_store.get(key) for key in keys]
+        all_cached = all(image is not None for image in cached_images)
+        telemetry.record_cache("image", all_cached)
+        if all_cached:
+            return cached_images
+
+        try:
+            # Call the OpenAI API to generate images
+            # init_client_openaikey()
+            response = rate_limiter.call(
+                "openai", image_model,
+                lambda: client.with_options(max_retries=0).images.generate(
+                    model=image_model,
+                    prompt=image_prompt,
+                    n=num_images,  # Number of images to generate
+                    size=image_size,  # Image resolution
+                    response_format="b64_json"  # Return the bytes directly instead of a short-lived URL
+                ),
+            )
+
+            # Decode each image once and keep it in the local store
+            images = []
+            for key, data in zip(keys, response.data):
+                if data.b64_json:
+                    image_bytes = base64.b64decode(data.b64_json)
+                else:
+                    with urllib.request.urlopen(data.url) as image_response:
+                        image_bytes = image_response.read()
+                image_store.put(key, image_bytes)
+                images.append(image_bytes)
+            return images
+
+        except Exception as e:
+            # Handle errors gracefully
+            print(f"Error generating image: {e}")
+            raise RuntimeError(f"Failed to generate image: {e}")
@@ -1,6 +1,57 @@
-import matplotlib.pyplot as plt
+from functools import lru_cache
 from io import BytesIO
-import streamlit as st
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from telemetry import telemetry
+
+
+@lru_cache(maxsize=256)
+def render_nutrition_pie_chart(protein, carbohydrates, fats):
+    """
+    Render the macronutrient pie chart as PNG bytes.
+
+    Uses a standalone Agg figure instead of pyplot, so no global state is
+    touched and charts can be rendered from several sessions at once. Results
+    are memoized by the (protein, carbohydrates, fats) tuple.
+
+    Args:
+        protein (int): Grams of protein.
+        carbohydrates (int): Grams of carbohydrates.
+        fats (int): Grams of fats.
+
+    Returns:
+        bytes: The encoded PNG image.
+    """
+    # Prepare data for the pie chart
+    labels = ['Protein', 'Carbohydrates', 'Fats']
+    values = [protein, carbohydrates, fats]
+    total = sum(values)
+
+    # Custom function to display grams instead of percentages
+    def grams_autopct(pct):
+        value = int(round(pct * total / 100.0))  # Convert percentage to actual value
+        return f"{value}g"
+
+    # Generate pie chart
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.pie(
+        values,
+        labels=labels,
+        autopct=grams_autopct,  # Use the custom function here
+        startangle=140,
+        colors=['#4CAF50', '#FFC107', '#2196F3']
+    )
+    ax.set_title("Macronutrient Contribution to Total Grams")
+
+    # Convert plot to image; the figure is freed once it goes out of scope
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches='tight')
+    return buf.getvalue()
+
 
 def create_nutrition_pie_chart(nutrition_info):
     """
@@ -14,44 +65,19 @@ def create_nutrition_pie_chart(nutrition_info):
         BytesIO: A buffer containing the pie chart image.
     """
     try:
-        # Debugging output using st.write
-        st.write("Nutrition Info Inside Function:", nutrition_info)
-
         # Extract numeric values
         protein = int(nutrition_info.get("protein", 0))
         carbohydrates = int(nutrition_info.get("carbohydrates", 0))
         fats = int(nutrition_info.get("fats", 0))
 
-        st.write(f"Parsed Values -> Protein: {protein}, Carbs: {carbohydrates}, Fats: {fats}")
-
-        # Prepare data for the pie chart
-        labels = ['Protein', 'Carbohydrates', 'Fats']
-        values = [protein, carbohydrates, fats]
-
-        # Custom function to display grams instead of percentages
-        def grams_autopct(pct):
-            total = sum(values)
-            value = int(round(pct * total / 100.0))  # Convert percentage to actual value
-            return f"{value}g"
-
-        # Generate pie chart
-        fig, ax = plt.subplots()
-        ax.pie(
-            values,
-            labels=labels,
-            autopct=grams_autopct,  # Use the custom function here
-            startangle=140,
-            colors=['#4CAF50', '#FFC107', '#2196F3']
-        )
-        ax.set_title("Macronutrient Contribution to Total Grams")
-
-        # Convert plot to image
-        buf = BytesIO()
-        plt.savefig(buf, format="png", bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)  # Close the figure to avoid memory issues
-        return buf
+        # A call that adds no miss was served from the memo (approximate when
+        # several sessions render at the same moment)
+        misses = render_nutrition_pie_chart.cache_info().misses
+        chart = render_nutrition_pie_chart(protein, carbohydrates, fats)
+        telemetry.record_cache("chart", render_nutrition_pie_chart.cache_info().misses == misses)
+
+        # Each caller gets its own buffer over the shared, memoized bytes
+        return BytesIO(chart)
 
     except Exception as e:
-        st.error(f"Error Parsing Nutrition Info: {nutrition_info}")
-        raise ValueError(f"Invalid nutrition data: {e}")
\ No newline at end of file
+        raise ValueError(f"Invalid nutrition data {nutrition_info}: {e}")
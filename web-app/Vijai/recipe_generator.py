@@ -1,24 +1,23 @@
 import openai
 import json
+import time
 from __init__ import client  # Import the client object from __init__.py
+from response_cache import response_cache, make_cache_key
+from stream_parser import IncrementalJSONParser
+from rate_limiter import rate_limiter, estimate_tokens, CircuitOpenError, RateLimitTimeout
+from telemetry import telemetry
 
-def generate_full_output_with_template(user_input):
+RECIPE_MODEL = "gpt-4-turbo"
+
+def build_messages(user_input):
     """
-    Generate a structured recipe, image prompt, ingredient suggestions, and nutritional information in one prompt.
+    Build the chat messages for a recipe request.
 
     Args:
-        user_input (dict): A dictionary containing:
-            - ingredients (str): A comma-separated list of ingredients.
-            - dietary_restrictions (str): Dietary restrictions (e.g., vegetarian, vegan, gluten-free).
-            - cuisine_preferences (str): Preferred cuisine type.
-            - time_constraints (str): Time constraints for the meal.
+        user_input (dict): The recipe request (see generate_full_output_with_template).
 
     Returns:
-        dict: A structured dictionary containing:
-            - recipe_details (dict): Title, ingredients, and instructions.
-            - image_prompt (str): A concise image generation prompt.
-            - ingredient_suggestions (list): Suggested additional ingredients.
-            - nutrition_info (dict): Nutritional breakdown.
+        list: Chat messages for the completion API.
     """
     # Extract user inputs
     ingredients = user_input.get("ingredients", "none")
@@ -53,16 +52,80 @@ def generate_full_output_with_template(user_input):
                     f"  }}\n"
                     f"}}"}
     ]
+    return messages
+
+
+def build_output(structured_response):
+    """
+    Extract the fields used by the app from a parsed GPT response.
+
+    Args:
+        structured_response (dict): The parsed JSON response.
+
+    Returns:
+        dict: recipe_details, image_prompt, ingredient_suggestions and nutrition_info.
+    """
+    # Extract fields from structured response
+    recipe_details = structured_response.get("recipe_details", {})
+    image_prompt = structured_response.get("image_prompt", "Not provided")
+    ingredient_suggestions = structured_response.get("ingredient_suggestions", [])
+    nutrition_info = structured_response.get("nutrition_info", {})
+
+    return {
+        "recipe_details": recipe_details,
+        "image_prompt": image_prompt,
+        "ingredient_suggestions": ingredient_suggestions,
+        "nutrition_info": nutrition_info
+    }
+
+
+def generate_full_output_with_template(user_input, use_cache=True):
+    """
+    Generate a structured recipe, image prompt, ingredient suggestions, and nutritional information in one prompt.
+
+    Args:
+        user_input (dict): A dictionary containing:
+            - ingredients (str): A comma-separated list of ingredients.
+            - dietary_restrictions (str): Dietary restrictions (e.g., vegetarian, vegan, gluten-free).
+            - cuisine_preferences (str): Preferred cuisine type.
+            - time_constraints (str): Time constraints for the meal.
+        use_cache (bool): Serve repeated requests from the response cache (default is True).
+
+    Returns:
+        dict: A structured dictionary containing:
+            - recipe_details (dict): Title, ingredients, and instructions.
+            - image_prompt (str): A concise image generation prompt.
+            - ingredient_suggestions (list): Suggested additional ingredients.
+            - nutrition_info (dict): Nutritional breakdown.
+    """
+    # Serve repeated requests from the cache
+    cache_key = make_cache_key(user_input)
+    if use_cache:
+        cached_output = response_cache.get(cache_key)
+        telemetry.record_cache("response", cached_output is not None)
+        if cached_output is not None:
+            return cached_output
+
+    with telemetry.span("prompt"):
+        messages = build_messages(user_input)
 
     try:
         # Call GPT-4 API
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            #model= "llama3.2",
-            messages=messages,
-            max_tokens=1500,
-            temperature=0.7
-        )
+        # Paced by the shared rate limiter, which also retries 429s
+        with telemetry.span("llm", model=RECIPE_MODEL, stream=False) as llm_span:
+            response = rate_limiter.call(
+                "openai", RECIPE_MODEL,
+                lambda: client.with_options(max_retries=0).chat.completions.create(
+                    model=RECIPE_MODEL,
+                    #model= "llama3.2",
+                    messages=messages,
+                    max_tokens=1500,
+                    temperature=0.7
+                ),
+                tokens=estimate_tokens(json.dumps(messages), 1500),
+                usage=lambda completion: getattr(completion.usage, "total_tokens", None),
+            )
+            _record_usage(llm_span, response.usage)
 
         # Extract raw content
         raw_content = response.choices[0].message.content
@@ -71,20 +134,15 @@ def generate_full_output_with_template(user_input):
         print("Raw GPT Response:", raw_content)
 
         # Parse the JSON response
-        structured_response = json.loads(raw_content)
+        with telemetry.span("parse"):
+            structured_response = json.loads(raw_content)
 
-        # Extract fields from structured response
-        recipe_details = structured_response.get("recipe_details", {})
-        image_prompt = structured_response.get("image_prompt", "Not provided")
-        ingredient_suggestions = structured_response.get("ingredient_suggestions", [])
-        nutrition_info = structured_response.get("nutrition_info", {})
+            output = build_output(structured_response)
 
-        return {
-            "recipe_details": recipe_details,
-            "image_prompt": image_prompt,
-            "ingredient_suggestions": ingredient_suggestions,
-            "nutrition_info": nutrition_info
-        }
+        # Only successful responses are cached, so failures are retried next time
+        if use_cache:
+            response_cache.set(cache_key, output)
+        return output
 
     except json.JSONDecodeError as e:
         # Handle JSON parsing errors
@@ -96,7 +154,7 @@ def generate_full_output_with_template(user_input):
             "ingredient_suggestions": [],
             "nutrition_info": {}
         }
-    except openai.OpenAIError as e:
+    except (openai.OpenAIError, CircuitOpenError, RateLimitTimeout) as e:
         # Handle OpenAI API errors
         print(f"Error generating full output: {e}")
         return {
@@ -104,4 +162,185 @@ def generate_full_output_with_template(user_input):
             "image_prompt": "Failed to generate image prompt.",
             "ingredient_suggestions": [],
             "nutrition_info": {}
-        }
\ No newline at end of file
+        }
+
+
+# Paths in the streamed JSON document that are reported to the UI as they complete
+STREAM_FIELDS = {
+    ("recipe_details", "title"): "title",
+    ("image_prompt",): "image_prompt",
+    ("nutrition_info",): "nutrition_info",
+}
+
+# Lists whose items are reported one by one
+STREAM_LIST_FIELDS = {
+    ("recipe_details", "ingredients"): "ingredient",
+    ("recipe_details", "instructions"): "instruction",
+    ("ingredient_suggestions",): "ingredient_suggestion",
+}
+
+
+def _stream_field(path):
+    if path in STREAM_FIELDS:
+        return STREAM_FIELDS[path]
+    if path and isinstance(path[-1], int):
+        return STREAM_LIST_FIELDS.get(path[:-1])
+    return None
+
+
+def _replay_output(output):
+    # Emit a finished output as the same events a live stream would produce
+    recipe_details = output.get("recipe_details", {})
+    if isinstance(recipe_details, dict):
+        if "title" in recipe_details:
+            yield "title", recipe_details["title"]
+        for ingredient in recipe_details.get("ingredients", []):
+            yield "ingredient", ingredient
+        for instruction in recipe_details.get("instructions", []):
+            yield "instruction", instruction
+    yield "image_prompt", output.get("image_prompt", "Not provided")
+    for suggestion in output.get("ingredient_suggestions", []):
+        yield "ingredient_suggestion", suggestion
+    yield "nutrition_info", output.get("nutrition_info", {})
+
+
+def _record_usage(span, usage):
+    # Token counts reported by the API, on the span and in the token counters
+    if usage is None:
+        return
+    span.set("prompt_tokens", usage.prompt_tokens)
+    span.set("completion_tokens", usage.completion_tokens)
+    telemetry.record_tokens(RECIPE_MODEL, usage.prompt_tokens, usage.completion_tokens)
+
+
+def _stream_tokens(messages, span):
+    """
+    Yield the completion's text tokens while holding a rate limiter slot.
+
+    The slot is held until the stream is fully read. Errors raised while the
+    caller parses the tokens do not count against the provider. Token counts
+    from the final usage chunk are recorded on `span`.
+    """
+    with rate_limiter.slot("openai", RECIPE_MODEL, estimate_tokens(json.dumps(messages), 1500)):
+        stream = client.with_options(max_retries=0).chat.completions.create(
+            model=RECIPE_MODEL,
+            messages=messages,
+            max_tokens=1500,
+            temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        for chunk in stream:
+            if chunk.usage is not None:
+                _record_usage(span, chunk.usage)
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+
+def stream_full_output_with_template(user_input, use_cache=True):
+    """
+    Streaming variant of generate_full_output_with_template.
+
+    The chat completion is consumed token by token and parsed incrementally, so
+    each part of the recipe is yielded as soon as it is syntactically complete.
+
+    Args:
+        user_input (dict): The recipe request (see generate_full_output_with_template).
+        use_cache (bool): Serve repeated requests from the response cache (default is True).
+
+    Yields:
+        tuple: (event, value) pairs where event is one of "title", "ingredient",
+        "instruction", "image_prompt", "ingredient_suggestion" or "nutrition_info".
+        The last event is always ("complete", output) with the same dictionary
+        generate_full_output_with_template returns.
+    """
+    # Serve repeated requests from the cache
+    cache_key = make_cache_key(user_input)
+    if use_cache:
+        cached_output = response_cache.get(cache_key)
+        telemetry.record_cache("response", cached_output is not None)
+        if cached_output is not None:
+            yield from _replay_output(cached_output)
+            yield "complete", cached_output
+            return
+
+    with telemetry.span("prompt"):
+        messages = build_messages(user_input)
+    parser = IncrementalJSONParser()
+    raw_content = ""
+
+    # The stream yields to the caller between tokens, so these spans are
+    # started and ended explicitly instead of being made current. The llm
+    # span covers the whole stream; parse counts only the time in the parser.
+    llm_span = telemetry.start_span("llm", model=RECIPE_MODEL, stream=True)
+    parse_span = telemetry.start_span("parse", incremental=True)
+    parse_seconds = 0.0
+
+    try:
+        try:
+            for token in _stream_tokens(messages, llm_span):
+                if not raw_content:
+                    ttft = llm_span.elapsed()
+                    llm_span.set("ttft_seconds", round(ttft, 4))
+                    telemetry.observe("recipe_llm_time_to_first_token_seconds", ttft, model=RECIPE_MODEL)
+                raw_content += token
+
+                parse_start = time.perf_counter()
+                events = parser.feed(token)
+                parse_seconds += time.perf_counter() - parse_start
+                for path, value in events:
+                    if path == ():
+                        structured_response = value
+                        continue
+                    field = _stream_field(path)
+                    if field is not None:
+                        yield field, value
+        except BaseException as e:
+            if isinstance(e, ValueError):
+                # The parser rejected a token; the stream itself was fine
+                telemetry.end_span(llm_span)
+                telemetry.end_span(parse_span, e, duration=parse_seconds)
+            else:
+                telemetry.end_span(llm_span, e)
+            raise
+        telemetry.end_span(llm_span)
+
+        parse_start = time.perf_counter()
+        try:
+            if not parser.done:
+                raise json.JSONDecodeError("Incomplete JSON response", raw_content, len(raw_content))
+
+            output = build_output(structured_response)
+        except ValueError as e:
+            telemetry.end_span(parse_span, e, duration=parse_seconds + time.perf_counter() - parse_start)
+            raise
+        telemetry.end_span(parse_span, duration=parse_seconds + time.perf_counter() - parse_start)
+
+        # Only successful responses are cached, so failures are retried next time
+        if use_cache:
+            response_cache.set(cache_key, output)
+        yield "complete", output
+
+    except ValueError as e:
+        # Handle JSON parsing errors (json.JSONDecodeError is a ValueError)
+        print(f"Error parsing streamed JSON response: {e}")
+        print("Raw GPT Response (invalid JSON):", raw_content)
+        yield "complete", {
+            "recipe_details": "Failed to parse recipe details.",
+            "image_prompt": "Failed to parse image prompt.",
+            "ingredient_suggestions": [],
+            "nutrition_info": {}
+        }
+    except (openai.OpenAIError, CircuitOpenError, RateLimitTimeout) as e:
+        # Handle OpenAI API errors
+        print(f"Error generating full output: {e}")
+        yield "complete", {
+            "recipe_details": "Failed to generate recipe details.",
+            "image_prompt": "Failed to generate image prompt.",
+            "ingredient_suggestions": [],
+            "nutrition_info": {}
+        }
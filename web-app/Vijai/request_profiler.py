@@ -0,0 +1,252 @@
+"""
+Opt-in sampling profiler for single requests.
+
+A profiled request gets a daemon thread that samples the request thread's
+stack every RECIPE_PROFILE_INTERVAL seconds (default 0.005) and, with
+RECIPE_PROFILE_ALLOCATIONS=1, tracemalloc allocation statistics. Files are
+written to RECIPE_PROFILE_DIR (default profiles/ next to this file):
+
+    <time>-<name>-<n>.collapsed   folded stacks, one "frame;frame;frame count"
+                                  line per stack; flamegraph.pl, speedscope and
+                                  inferno read it directly
+    <time>-<name>-<n>.alloc.txt   peak traced memory and the source lines that
+                                  allocated the most memory during the request
+                                  (only with RECIPE_PROFILE_ALLOCATIONS=1)
+
+A request is profiled when the caller forces it (force=True) or, otherwise,
+with probability RECIPE_PROFILE_RATE (default 0). force=False opts a request
+out of sampling. ?profile=1 or ?profile=0 in the page URL is honoured only
+when the operator sets RECIPE_PROFILE_QUERY=1; otherwise any visitor could
+make the server profile their requests.
+
+Only the request thread is sampled; work it hands to thread pools shows up as
+time spent waiting. tracemalloc is process-wide, so allocations of other
+requests running at the same time are included.
+
+Overhead, measured with bench_profiler.py on the CPU side of a run_app request
+(stream parsing, build_output, an uncached chart render; about 60 ms): when a
+request is not profiled, profile() costs 1-2 microseconds, below the noise of
+the request. Stack sampling at 5 ms adds about 1-3%. tracemalloc makes the
+same request about 4x slower, almost all of it in matplotlib's allocations,
+which is why it is off unless RECIPE_PROFILE_ALLOCATIONS=1.
+"""
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+def parse_toggle(value):
+    """
+    Read a per-request profiling switch such as the ?profile= query parameter.
+    Use RequestProfiler.from_query for values sent by visitors.
+
+    Returns:
+        bool or None: True for "1"/"true", False for "0"/"false", None (use the sample rate) otherwise.
+    """
+    value = str(value).strip().lower() if value is not None else ""
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    return None
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval from a daemon thread.
+
+    Stacks are kept in folded form (root first, frames joined by ";") with the
+    number of samples that saw each one.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}  # code object -> frame label
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _AllocationTracker:
+    # tracemalloc is process-wide: it runs while at least one profiled request does
+    def __init__(self, frames=1):
+        self.frames = frames  # the report groups by the allocating line, one frame is enough
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started_here = False
+
+    def begin(self):
+        """
+        Returns:
+            Snapshot or None: What was already traced; None if tracing starts now with nothing traced.
+        """
+        with self._lock:
+            if self._users == 0:
+                self._started_here = not tracemalloc.is_tracing()
+                if self._started_here:
+                    tracemalloc.start(self.frames)
+                    self._users += 1
+                    return None
+                tracemalloc.reset_peak()
+            self._users += 1
+        # Snapshotting the traced heap is the expensive part, so it is skipped when possible
+        return tracemalloc.take_snapshot()
+
+    def end(self, before, top):
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._started_here:
+                tracemalloc.stop()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        if before is None:
+            stats = after.filter_traces(filters).statistics("lineno")
+        else:
+            stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        lines = [f"peak traced memory: {peak / 1024:.1f} KiB", f"top {top} lines by memory allocated during the request:"]
+        for stat in stats[:top]:
+            lines.append(str(stat))
+        return "\n".join(lines) + "\n"
+
+
+class Profile:
+    # Result of one profiled request
+    def __init__(self, name, collapsed_path, alloc_path):
+        self.name = name
+        self.collapsed_path = collapsed_path
+        self.alloc_path = alloc_path
+        self.duration = None
+        self.samples = 0
+
+
+class RequestProfiler:
+    """
+    Profiles selected requests with a stack sampler and, optionally, tracemalloc.
+
+    Usage:
+        force = request_profiler.from_query(query_value)
+        with request_profiler.profile("run_app", force=force) as profile:
+            ...  # profile is None when this request is not profiled
+
+    Args:
+        sample_rate (float): Fraction of requests profiled when they do not ask either way.
+        interval (float): Seconds between stack samples.
+        output_dir (str): Where the .collapsed and .alloc.txt files are written.
+        allocations (bool): Also collect tracemalloc statistics.
+        top (int): Number of allocation sites in the report.
+        query_toggle (bool): Let the ?profile= query parameter force profiling on or off.
+    """
+
+    def __init__(self, sample_rate=0.0, interval=0.005, output_dir="profiles", allocations=False, top=25,
+                 query_toggle=False):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self.allocations = allocations
+        self.top = top
+        self.query_toggle = query_toggle
+        self._allocation_tracker = _AllocationTracker()
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.counters = {"profiled": 0}
+
+    def from_query(self, value):
+        """
+        Turn a ?profile= query value into a force argument for profile().
+
+        Returns:
+            bool or None: parse_toggle(value) when query toggles are enabled, None otherwise.
+        """
+        return parse_toggle(value) if self.query_toggle else None
+
+    def should_profile(self, force=None):
+        if force is not None:
+            return force
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, name, force=None):
+        if not self.should_profile(force):
+            yield None
+            return
+
+        with self._lock:
+            self.counters["profiled"] += 1
+            self._sequence += 1
+            sequence = self._sequence
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{sequence}")
+        profile = Profile(name, f"{stem}.collapsed", f"{stem}.alloc.txt" if self.allocations else None)
+
+        before = self._allocation_tracker.begin() if self.allocations else None
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield profile
+        finally:
+            sampler.stop()
+            profile.duration = time.perf_counter() - start
+            profile.samples = sampler.samples
+            with open(profile.collapsed_path, "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+            if self.allocations:
+                report = self._allocation_tracker.end(before, self.top)
+                with open(profile.alloc_path, "w", encoding="utf-8") as f:
+                    f.write(f"{name}: {profile.duration * 1000:.1f} ms, {profile.samples} stack samples\n{report}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+# Shared by every session in the process, configurable through the environment
+request_profiler = RequestProfiler(
+    sample_rate=float(os.getenv("RECIPE_PROFILE_RATE", 0.0)),
+    interval=float(os.getenv("RECIPE_PROFILE_INTERVAL", 0.005)),
+    output_dir=os.getenv(
+        "RECIPE_PROFILE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"),
+    ),
+    allocations=os.getenv("RECIPE_PROFILE_ALLOCATIONS", "0") == "1",
+    query_toggle=os.getenv("RECIPE_PROFILE_QUERY", "0") == "1",
+)
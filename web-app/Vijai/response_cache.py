@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_user_input(user_input):
+    """
+    Build a normalized, order-independent form of the recipe request.
+
+    Args:
+        user_input (dict): The same dictionary passed to generate_full_output_with_template.
+
+    Returns:
+        dict: Trimmed, lowercased values with the ingredients split and sorted.
+    """
+    ingredients = str(user_input.get("ingredients", "none"))
+    ingredient_list = sorted(
+        item.strip().lower() for item in ingredients.split(",") if item.strip()
+    )
+    return {
+        "ingredients": ingredient_list,
+        "dietary_restrictions": str(user_input.get("dietary_restrictions", "none")).strip().lower(),
+        "cuisine_preferences": str(user_input.get("cuisine_preferences", "none")).strip().lower(),
+        "time_constraints": str(user_input.get("time_constraints", "none")).strip().lower(),
+    }
+
+
+def make_cache_key(user_input):
+    """
+    Turn a recipe request into a stable cache key.
+
+    Args:
+        user_input (dict): The recipe request.
+
+    Returns:
+        str: A JSON string of the normalized request.
+    """
+    return json.dumps(normalize_user_input(user_input), sort_keys=True)
+
+
+class ResponseCache:
+    """
+    Two-tier cache: an in-process LRU in front of a persistent SQLite store.
+
+    Both tiers expire entries after `ttl_seconds` and evict the least recently
+    used entries once they hold more than their configured number of entries.
+    """
+
+    def __init__(self, db_path, ttl_seconds=24 * 60 * 60, memory_size=128, disk_size=10000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key, stored_at, value):
+        # Insert into the in-memory tier and drop the oldest entries beyond the limit
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): A key built with make_cache_key.
+
+        Returns:
+            dict or None: The cached response, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                raw_value, stored_at = row
+                if not self._expired(stored_at, now):
+                    self._conn.execute(
+                        "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                    )
+                    self._conn.commit()
+                    value = json.loads(raw_value)
+                    self._remember(key, stored_at, value)
+                    self._stats["disk_hits"] += 1
+                    return value
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Store a response in both tiers.
+
+        Args:
+            key (str): A key built with make_cache_key.
+            value (dict): A JSON-serializable response.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict_disk(now)
+            self._conn.commit()
+
+    def _evict_disk(self, now):
+        # Drop expired rows first, then the least recently used rows beyond the limit
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE stored_at < ?", (now - self.ttl_seconds,)
+            )
+            self._stats["evictions"] += cursor.rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.disk_size
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._stats["evictions"] += cursor.rowcount
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Report hit/miss counters for the cache.
+
+        Returns:
+            dict: Hit, miss and eviction counts plus the current hit rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+# Shared cache used by recipe_generator, configurable through the environment
+response_cache = ResponseCache(
+    db_path=os.getenv(
+        "RECIPE_CACHE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "recipe_cache.sqlite3"),
+    ),
+    ttl_seconds=int(os.getenv("RECIPE_CACHE_TTL_SECONDS", 24 * 60 * 60)),
+    memory_size=int(os.getenv("RECIPE_CACHE_MEMORY_SIZE", 128)),
+    disk_size=int(os.getenv("RECIPE_CACHE_DISK_SIZE", 10000)),
+)
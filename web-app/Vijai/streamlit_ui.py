@@ -2,10 +2,33 @@ import streamlit as st
 import base64
 import os
 
-from recipe_generator import generate_full_output_with_template
+from recipe_generator import stream_full_output_with_template
 from image_creator import generate_image
 from piechart import create_nutrition_pie_chart
+from telemetry import telemetry
+from rate_limiter import rate_limiter
+from request_profiler import request_profiler
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Start the DALL·E call as soon as the image prompt is streamed, so chart rendering
+# and page layout continue while it is in flight. Set RECIPE_CONCURRENT_MODE=0 to
+# run the stages one after another.
+CONCURRENT_MODE = os.getenv("RECIPE_CONCURRENT_MODE", "1") != "0"
+
+# Shared by all sessions; image generation only waits on the network
+image_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RECIPE_IMAGE_WORKERS", 8)),
+    thread_name_prefix="image-generation"
+)
+
+# Prometheus metrics for every session in this process, at http://127.0.0.1:9464/metrics.
+# Set RECIPE_METRICS_PORT=0 to turn the endpoint off.
+METRICS_PORT = int(os.getenv("RECIPE_METRICS_PORT", 9464))
+if METRICS_PORT:
+    telemetry.watch_rate_limiter(rate_limiter)
+    telemetry.start_metrics_server(os.getenv("RECIPE_METRICS_HOST", "127.0.0.1"), METRICS_PORT)
 
 
 # Function to extract numerical values from the dictionary
@@ -39,6 +62,33 @@ def get_local_image_url(file_path):
         encoded = base64.b64encode(image_file.read()).decode()
         return f"data:image/png;base64,{encoded}"
 
+# Function to render the recipe title into a placeholder
+def render_title(placeholder, recipe_title):
+    # Display the recipe title with a custom color and background highlight
+    placeholder.markdown(
+        f"""
+        <div style="background-color: #f0f0f0; color: #000000; padding: 10px; border-radius: 5px;">
+            <h3 style="margin: 0; text-align: center;">{recipe_title}</h3>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+# Function to render the ingredients table into a placeholder
+def render_ingredients(placeholder, ingredients):
+    if ingredients:
+        # Create a table with a single column for the ingredients
+        placeholder.table({"Ingredient Details": ingredients})
+    else:
+        placeholder.markdown("No ingredients provided.")
+
+# Function to render the instructions as a numbered list into a placeholder
+def render_instructions(placeholder, instructions):
+    if instructions:
+        placeholder.markdown("\n".join(f"{idx}. {instruction}" for idx, instruction in enumerate(instructions, 1)))
+    else:
+        placeholder.markdown("No instructions provided.")
+
 
 
 def run_app():
@@ -78,102 +128,115 @@ def run_app():
             st.error("Please enter ingredients to generate a recipe.")
             return
 
-        # Call recipe generation function
-        with st.spinner("Generating recipe..."):
-            try:
-                # Combine all user inputs into a single input for recipe generation
-                full_input = {
-                    "ingredients": ingredients,
-                    "dietary_restrictions": dietary_restrictions,
-                    "cuisine_preferences": cuisine_preferences,
-                    "time_constraints": time_constraints,
-                }
-                output = generate_full_output_with_template(full_input)
-
-                # Extract results from the response
-                recipe_details = output.get("recipe_details", {})
-                image_prompt = output.get("image_prompt", "Not provided")
-                ingredient_suggestions = output.get("ingredient_suggestions", [])
-                nutrition_info = output.get("nutrition_info", {})
-
-                st.success("Recipe generated successfully!")
-            except Exception as e:
-                st.error(f"Error generating recipe: {e}")
-                return
-
-        # Display recipe details
-        # Display recipe details
-        st.subheader("Generated Recipe")
-
-        # 1. Display title in heading font with underline
-        recipe_title = recipe_details.get('title', 'Not provided')
-        # Display the recipe title with a custom color and background highlight
-        st.markdown(
-            f"""
-            <div style="background-color: #f0f0f0; color: #000000; padding: 10px; border-radius: 5px;">
-                <h3 style="margin: 0; text-align: center;">{recipe_title}</h3>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        #st.markdown("<hr style='border:1px solid black;'>", unsafe_allow_html=True)
-
-        # 2. Display ingredients in a table format (1 column for ingredient details)
-        st.markdown("#### Ingredients:")
-        ingredients = recipe_details.get("ingredients", [])
-        if ingredients:
-            # Create a DataFrame with a single column for the ingredients
-            ingredient_table = {"Ingredient Details": ingredients}
-            print(ingredient_table)
-
-            # Display the table using Streamlit
-            st.table(ingredient_table)
-        else:
-            st.markdown("No ingredients provided.")
-
-        # 3. Display instructions as a numbered list
-        st.markdown("#### Instructions:")
-        instructions = recipe_details.get("instructions", [])
-        if instructions:
-            for idx, instruction in enumerate(instructions, 1):
-                st.markdown(f"{idx}. {instruction}")
-        else:
-            st.markdown("No instructions provided.")
-
-        # Display additional ingredient suggestions
-        st.subheader("Add-On Recommendations")
-        st.text("\n".join(ingredient_suggestions))
-
-        # Display nutrition information
-        #st.subheader("Nutrition Information")
-        #st.json(nutrition_info)
-        nutrition_info = extract_numerical_values(nutrition_info)
-        nutrition_info.pop('calories', None)  # Remove 'calories' if it exists
-        print('nutrition_info',nutrition_info)
-
-        # Generate and display pie chart for macronutrient contribution
-        if nutrition_info:
-            st.subheader("Macronutrient Contribution to Calories")
-            try:
-                print("Calling create_nutrition_pie_chart")
-                nutrition_chart = create_nutrition_pie_chart(nutrition_info)
-                if nutrition_chart:
-                    st.image(nutrition_chart, caption="Macronutrient Breakdown")
-            except ValueError as e:
-                st.error(f"Error generating macronutrient pie chart: {e}")
-
-        # Generate image from the prompt
-        with st.spinner("Generating image..."):
-            try:
-                image_url = generate_image(image_prompt)
-                st.success("Image generated successfully!")
-            except Exception as e:
-                st.error(f"Error generating image: {e}")
-                return
-
-        # Display the image
-        st.subheader("Generated Dish Image")
-        st.image(image_url, caption="Dish Visualization", use_container_width=True)
+        # One trace per button press; the stages below are its child spans.
+        # With RECIPE_PROFILE_QUERY=1, ?profile=1 in the page URL also profiles this
+        # press (see request_profiler.py).
+        profile_toggle = request_profiler.from_query(st.query_params.get("profile"))
+        with request_profiler.profile("run_app", force=profile_toggle) as profile, \
+                telemetry.span("request", concurrent=CONCURRENT_MODE) as request_span:
+            if profile is not None:
+                request_span.set("profile", profile.collapsed_path)
+            # Lay out the recipe so each part can be filled in as soon as it is streamed
+            st.subheader("Generated Recipe")
+            title_placeholder = st.empty()
+            st.markdown("#### Ingredients:")
+            ingredients_placeholder = st.empty()
+            st.markdown("#### Instructions:")
+            instructions_placeholder = st.empty()
+
+            # Call recipe generation function
+            image_future = None
+            with st.spinner("Generating recipe..."):
+                try:
+                    # Combine all user inputs into a single input for recipe generation
+                    full_input = {
+                        "ingredients": ingredients,
+                        "dietary_restrictions": dietary_restrictions,
+                        "cuisine_preferences": cuisine_preferences,
+                        "time_constraints": time_constraints,
+                    }
+
+                    # Render the title, ingredients and instructions progressively
+                    streamed_ingredients = []
+                    streamed_instructions = []
+                    output = {}
+                    for event, value in stream_full_output_with_template(full_input):
+                        if event == "title":
+                            render_title(title_placeholder, value)
+                        elif event == "ingredient":
+                            streamed_ingredients.append(value)
+                            render_ingredients(ingredients_placeholder, streamed_ingredients)
+                        elif event == "instruction":
+                            streamed_instructions.append(value)
+                            render_instructions(instructions_placeholder, streamed_instructions)
+                        elif event == "image_prompt" and CONCURRENT_MODE:
+                            # Bound to this request's trace, although it runs on the pool
+                            image_future = image_executor.submit(telemetry.bind(generate_image), value)
+                        elif event == "complete":
+                            output = value
+
+                    # Extract results from the response
+                    recipe_details = output.get("recipe_details", {})
+                    image_prompt = output.get("image_prompt", "Not provided")
+                    ingredient_suggestions = output.get("ingredient_suggestions", [])
+                    nutrition_info = output.get("nutrition_info", {})
+
+                    st.success("Recipe generated successfully!")
+                except Exception as e:
+                    if image_future is not None:
+                        image_future.cancel()
+                    request_span.set("failed_stage", "recipe")
+                    st.error(f"Error generating recipe: {e}")
+                    return
+
+            # Display the final recipe details
+            render_title(title_placeholder, recipe_details.get('title', 'Not provided'))
+            render_ingredients(ingredients_placeholder, recipe_details.get("ingredients", []))
+            render_instructions(instructions_placeholder, recipe_details.get("instructions", []))
+
+            # Display additional ingredient suggestions
+            st.subheader("Add-On Recommendations")
+            st.text("\n".join(ingredient_suggestions))
+
+            # Display nutrition information
+            #st.subheader("Nutrition Information")
+            #st.json(nutrition_info)
+            with telemetry.span("nutrition"):
+                nutrition_info = extract_numerical_values(nutrition_info)
+            nutrition_info.pop('calories', None)  # Remove 'calories' if it exists
+            print('nutrition_info',nutrition_info)
+
+            # Generate and display pie chart for macronutrient contribution
+            if nutrition_info:
+                st.subheader("Macronutrient Contribution to Calories")
+                try:
+                    print("Calling create_nutrition_pie_chart")
+                    with telemetry.span("chart"):
+                        nutrition_chart = create_nutrition_pie_chart(nutrition_info)
+                    if nutrition_chart:
+                        st.image(nutrition_chart, caption="Macronutrient Breakdown")
+                except ValueError as e:
+                    st.error(f"Error generating macronutrient pie chart: {e}")
+
+            # Generate image from the prompt
+            with st.spinner("Generating image..."):
+                try:
+                    if image_future is not None:
+                        # Already started while the recipe was streaming
+                        with telemetry.span("image_wait"):
+                            dish_images = image_future.result()
+                    else:
+                        dish_images = generate_image(image_prompt)
+                    st.success("Image generated successfully!")
+                except Exception as e:
+                    request_span.set("failed_stage", "image")
+                    st.error(f"Error generating image: {e}")
+                    return
+
+            # Display the image
+            st.subheader("Generated Dish Image")
+            st.image(dish_images, caption="Dish Visualization", use_container_width=True)
+
 
 if __name__ == "__main__":
     run_app()
\ No newline at end of file
@@ -0,0 +1,318 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets in seconds, from cache hits up to slow GPT-4 completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    "recipe_stage_duration_seconds": ("histogram", "Time spent in each stage of a recipe request."),
+    "recipe_llm_time_to_first_token_seconds": ("histogram", "Time from sending the chat request to the first streamed token."),
+    "recipe_llm_tokens_total": ("counter", "Prompt and completion tokens reported by the model."),
+    "recipe_cache_requests_total": ("counter", "Cache lookups by cache and result."),
+    "recipe_stage_errors_total": ("counter", "Stages that ended with an exception."),
+    # Read from the rate limiter on every scrape, see watch_rate_limiter
+    "recipe_rate_limiter_requests_total": ("counter", "Calls admitted by the rate limiter."),
+    "recipe_rate_limiter_rejected_total": ("counter", "Calls refused before being sent: circuit breaker open or queue timeout."),
+    "recipe_rate_limiter_errors_total": ("counter", "Admitted calls that got a 429 (throttled) or a timeout, connection error or 5xx (failure)."),
+    "recipe_rate_limiter_retries_total": ("counter", "429 responses retried after backoff."),
+    "recipe_rate_limiter_queue_wait_seconds": ("gauge", "Time calls waited for admission, quantiles over the last 1000 admitted calls."),
+    "recipe_rate_limiter_in_flight": ("gauge", "Calls currently holding a rate limiter slot."),
+    "recipe_rate_limiter_concurrency_limit": ("gauge", "Adaptive concurrency limit; halved on 429, grows back on success."),
+    "recipe_rate_limiter_circuit_state": ("gauge", "1 for the circuit breaker's current state, 0 for the others."),
+}
+
+CIRCUIT_STATES = ("closed", "open", "half-open")
+
+# The innermost open span of the current request
+_current_span = contextvars.ContextVar("recipe_current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage of a request.
+
+    Spans opened inside another span share its trace id, so every stage of one
+    button press can be found in the trace file by a single id.
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start_time, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def _rate_limiter_samples(report):
+    # (metric, value, labels) for each provider in RateLimiter.metrics()
+    samples = []
+    for provider, metrics in report.items():
+        samples += [
+            ("recipe_rate_limiter_requests_total", metrics["requests"], {"provider": provider}),
+            ("recipe_rate_limiter_rejected_total", metrics["circuit_open"], {"provider": provider, "reason": "circuit_open"}),
+            ("recipe_rate_limiter_rejected_total", metrics["queue_timeouts"], {"provider": provider, "reason": "queue_timeout"}),
+            ("recipe_rate_limiter_errors_total", metrics["throttled"], {"provider": provider, "kind": "throttled"}),
+            ("recipe_rate_limiter_errors_total", metrics["failures"], {"provider": provider, "kind": "failure"}),
+            ("recipe_rate_limiter_retries_total", metrics["retries"], {"provider": provider}),
+            ("recipe_rate_limiter_queue_wait_seconds", metrics["queue_wait_p50"], {"provider": provider, "quantile": "0.5"}),
+            ("recipe_rate_limiter_queue_wait_seconds", metrics["queue_wait_p95"], {"provider": provider, "quantile": "0.95"}),
+            ("recipe_rate_limiter_queue_wait_seconds", metrics["queue_wait_max"], {"provider": provider, "quantile": "1"}),
+            ("recipe_rate_limiter_in_flight", metrics["in_flight"], {"provider": provider}),
+            ("recipe_rate_limiter_concurrency_limit", metrics["concurrency_limit"], {"provider": provider}),
+        ]
+        for state in CIRCUIT_STATES:
+            samples.append((
+                "recipe_rate_limiter_circuit_state", int(metrics["breaker"] == state), {"provider": provider, "state": state},
+            ))
+    return samples
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+class Telemetry:
+    """
+    Span-based timing for the recipe app, exported as Prometheus metrics and a JSONL trace.
+
+    Every finished span is added to the recipe_stage_duration_seconds histogram
+    and, when `trace_path` is set, written as one JSON line. The trace file is
+    rotated to `<trace_path>.1` once it grows past `trace_max_bytes`.
+    """
+
+    def __init__(self, trace_path=None, trace_max_bytes=50 * 1024 * 1024, buckets=DEFAULT_BUCKETS):
+        self.trace_path = trace_path
+        self.trace_max_bytes = trace_max_bytes
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}  # (metric, labels) -> [bucket counts..., sum, count]
+        self._counters = {}  # (metric, labels) -> value
+        self._rate_limiters = []  # read on every scrape
+        self._trace_file = None
+        self._server = None
+
+    # Spans
+
+    def start_span(self, name, **attributes):
+        """
+        Start a span under the current one without making it current.
+
+        For code that cannot wrap the stage in a with-block, such as a generator
+        that yields while the stage runs. Finish it with end_span.
+        """
+        return Span(name, _current_span.get(), attributes)
+
+    def end_span(self, span, error=None, duration=None):
+        # duration overrides the wall time for stages measured in pieces
+        span.duration = span.elapsed() if duration is None else duration
+        if error is not None:
+            span.error = type(error).__name__
+            self.count("recipe_stage_errors_total", stage=span.name, error=span.error)
+        self.observe("recipe_stage_duration_seconds", span.duration, stage=span.name)
+        self._write_trace(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the enclosed block as a stage; spans opened inside it become its children.
+
+        Usage:
+            with telemetry.span("llm", model="gpt-4-turbo") as span:
+                span.set("completion_tokens", 512)
+        """
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            _current_span.reset(token)
+            self.end_span(span, e)
+            raise
+        _current_span.reset(token)
+        self.end_span(span)
+
+    def bind(self, fn):
+        """
+        Make fn run under the spans open here, e.g. when it is submitted to a thread pool.
+        """
+        context = contextvars.copy_context()
+        return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+    # Metrics
+
+    def observe(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def count(self, metric, amount=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record_tokens(self, model, prompt_tokens=None, completion_tokens=None):
+        if prompt_tokens:
+            self.count("recipe_llm_tokens_total", prompt_tokens, model=model, kind="prompt")
+        if completion_tokens:
+            self.count("recipe_llm_tokens_total", completion_tokens, model=model, kind="completion")
+
+    def record_cache(self, cache, hit):
+        self.count("recipe_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+        span = _current_span.get()
+        if span is not None:
+            span.set(f"{cache}_cache_hit", hit)
+
+    def watch_rate_limiter(self, limiter):
+        """
+        Export a RateLimiter's counters, queue wait and breaker state with the other metrics.
+
+        The limiter is read on every scrape, so nothing is recorded between scrapes.
+        Watching the same limiter again, e.g. on a Streamlit rerun, does nothing.
+        """
+        with self._lock:
+            if not any(watched is limiter for watched in self._rate_limiters):
+                self._rate_limiters.append(limiter)
+
+    def prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The text served at /metrics.
+        """
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            counters = dict(self._counters)
+            rate_limiters = list(self._rate_limiters)
+
+        gauges = {}
+        for limiter in rate_limiters:
+            for metric, value, labels in _rate_limiter_samples(limiter.metrics()):
+                series = gauges if METRIC_HELP[metric][0] == "gauge" else counters
+                series[(metric, tuple(sorted(labels.items())))] = value
+
+        lines = []
+        for metric, (kind, help_text) in METRIC_HELP.items():
+            series = {"histogram": histograms, "gauge": gauges}.get(kind, counters)
+            keys = sorted(key for key in series if key[0] == metric)
+            if not keys:
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for key in keys:
+                labels = key[1]
+                if kind != "histogram":
+                    lines.append(f"{metric}{_labels(labels)} {series[key]}")
+                    continue
+                values = series[key]
+                for bound, count in zip(self.buckets, values):
+                    lines.append(f"{metric}_bucket{_labels(labels, [('le', repr(bound))])} {count}")
+                lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {values[-1]}")
+                lines.append(f"{metric}_sum{_labels(labels)} {values[-2]}")
+                lines.append(f"{metric}_count{_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, host="127.0.0.1", port=9464):
+        """
+        Serve /metrics from a daemon thread; does nothing if it is already running.
+
+        Returns:
+            bool: True if the server is running.
+        """
+        with self._lock:
+            if self._server is not None:
+                return True
+            telemetry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = telemetry.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            try:
+                self._server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as e:
+                # Another app process already serves this port
+                print(f"Metrics endpoint not started on {host}:{port}: {e}")
+                return False
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            return True
+
+    # Trace file
+
+    def _write_trace(self, span):
+        if not self.trace_path:
+            return
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._trace_file is None:
+                self._trace_file = open(self.trace_path, "a", encoding="utf-8")
+            elif self._trace_file.tell() > self.trace_max_bytes:
+                self._trace_file.close()
+                os.replace(self.trace_path, self.trace_path + ".1")
+                self._trace_file = open(self.trace_path, "a", encoding="utf-8")
+            self._trace_file.write(line)
+            self._trace_file.flush()
+
+
+# Shared by every module in the process, configurable through the environment
+telemetry = Telemetry(
+    trace_path=os.getenv(
+        "RECIPE_TRACE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl"),
+    ),
+    trace_max_bytes=int(os.getenv("RECIPE_TRACE_MAX_BYTES", 50 * 1024 * 1024)),
+)
@@ -3,21 +3,60 @@ from phi.agent import Agent, RunResponse
 from phi.model.groq import Groq
 from phi.tools.dalle import Dalle
 from phi.model.openai import OpenAIChat
+from phi.model.content import Image as AgentImage
+from openai import OpenAI
+from agent_pool import AgentPool
 from dotenv import load_dotenv
 from phi.utils.pprint import pprint_run_response
 from pydantic import BaseModel, Field
 from IPython.display import Image, display
-from typing import Iterator, List
+from typing import List
 import os
+from uuid import uuid4
 
 load_dotenv()
 
+# phi sends every agent run to api.phidata.com, from a new HTTP client and
+# inline with the request; only when PHI_TELEMETRY=true is set explicitly
+PHI_TELEMETRY = os.getenv("PHI_TELEMETRY", "false").lower() == "true"
+
+
+class SharedClientDalle(Dalle):
+    """
+    phi's Dalle tool, calling DALL·E through the shared openai_client.
+
+    The stock tool builds a new OpenAI client, with its own connection pool,
+    for every image.
+    """
+
+    def create_image(self, agent: Agent, prompt: str) -> str:
+        """Use this function to generate an image for a prompt.
+
+        Args:
+            prompt (str): A text description of the desired image.
+
+        Returns:
+            str: A message indicating if the image has been generated successfully or an error message.
+        """
+        try:
+            response = openai_client.images.generate(
+                prompt=prompt, model=self.model, n=self.n, quality=self.quality, size=self.size, style=self.style,
+            )
+            for img in response.data:
+                agent.add_image(
+                    AgentImage(id=str(uuid4()), url=img.url, original_prompt=prompt, revised_prompt=img.revised_prompt)
+                )
+            return "Image has been generated successfully and will be displayed below"
+        except Exception as e:
+            return f"Error: {e}"
+
 
 # Define the agents
 Recipe_Generator_agent = Agent(
     name="Recipe Generator",
     role="Generate a recipe",
     model=Groq(id="llama-3.3-70b-versatile"),
+    telemetry=PHI_TELEMETRY,
     GROQ_API_KEY = os.getenv("GROQ_API_KEY"),
     instructions=[
         "Always include recipe name, ingredients, Cuisine, Time to cook, and instructions in the response. "
@@ -32,6 +71,7 @@ Recipe_Generator_agent = Agent(
 
 extract_ImageSummary_agent = Agent(
     model=Groq(id="llama-3.3-70b-versatile"),
+    telemetry=PHI_TELEMETRY,
     GROQ_API_KEY = os.getenv("GROQ_API_KEY"),
     name="Summary Extractor",
     role="Extract summary from the response",
@@ -43,8 +83,9 @@ extract_ImageSummary_agent = Agent(
 
 image_generator_agent = Agent(
     model=OpenAIChat(id="gpt-4o"),
+    telemetry=PHI_TELEMETRY,
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY"),
-    tools=[Dalle()],
+    tools=[SharedClientDalle()],
     description="You are an AI agent that can generate images using DALL-E.",
     instructions="When the user asks you to create an image, use the `create_image` tool to create the image.",
     markdown=True,
@@ -52,21 +93,97 @@ image_generator_agent = Agent(
     show_tool_calls=True,
 )
 
+# Fast path: one structured call returns the recipe and its image summary,
+# then DALL·E is called directly instead of through a tool-calling agent
+FAST_PATH = os.getenv("RECIPE_FAST_PATH", "1") == "1"
+
+
+class RecipeWithImageSummary(BaseModel):
+    recipe: str = Field(
+        ...,
+        description="The full recipe in markdown: recipe name, ingredients, Cuisine, Time to cook, instructions, "
+        "and any modifications to make it vegan or gluten-free or allergen-free.",
+    )
+    image_summary: str = Field(
+        ...,
+        description="A short visual description of the finished dish, used as the prompt for an image of the recipe.",
+    )
+
+
+Fast_Recipe_agent = Agent(
+    name="Recipe Generator",
+    role="Generate a recipe and its image summary",
+    model=Groq(id="llama-3.3-70b-versatile"),
+    telemetry=PHI_TELEMETRY,
+    GROQ_API_KEY = os.getenv("GROQ_API_KEY"),
+    instructions=[
+        "Always include recipe name, ingredients, Cuisine, Time to cook, and instructions in the recipe. "
+        "Include any modifications to the recipe to make it vegan or gluten-free or allergen-free. "
+        "Also write a summary of the recipe useful for creating images of the recipe."
+    ],
+    response_model=RecipeWithImageSummary,
+    description="Generate a recipe.",
+)
+
+def create_image(image_summary):
+    # Same request the Dalle tool makes, without the gpt-4o round trip
+    response = openai_client.images.generate(
+        model="dall-e-3",
+        prompt=image_summary,
+        n=1,
+        size="1024x1024",
+        quality="standard",
+    )
+    return response.data[0].url
+
+
+# The agents above are templates: each request borrows its own clean copy
+# from a pool sized to the number of requests Gradio runs at once
+CONCURRENCY = int(os.getenv("RECIPE_CONCURRENCY", 4))
+recipe_generator_pool = AgentPool(Recipe_Generator_agent, CONCURRENCY)
+image_summary_pool = AgentPool(extract_ImageSummary_agent, CONCURRENCY)
+image_generator_pool = AgentPool(image_generator_agent, CONCURRENCY)
+fast_recipe_pool = AgentPool(Fast_Recipe_agent, CONCURRENCY)
+
+# One thread-safe OpenAI client for every DALL·E call, shared by all requests
+openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def generate_recipe_and_image_fast(prompt):
+    with fast_recipe_pool.agent() as agent:
+        response: RunResponse = agent.run(prompt)
+    result = response.content
+    if not isinstance(result, RecipeWithImageSummary):
+        # The model did not return valid JSON; fall back to the agent pipeline
+        return generate_recipe_and_image_agents(prompt)
+    return result.recipe, create_image(result.image_summary)
+
+
 # Gradio app logic
 def generate_recipe_and_image(prompt):
+    if FAST_PATH:
+        return generate_recipe_and_image_fast(prompt)
+    return generate_recipe_and_image_agents(prompt)
+
+
+def generate_recipe_and_image_agents(prompt):
     # Step 1: Generate the recipe
-    recipe_response: Iterator[RunResponse] = Recipe_Generator_agent.run(prompt)
+    with recipe_generator_pool.agent() as agent:
+        recipe_response: RunResponse = agent.run(prompt)
     recipe_text = recipe_response.content 
     
     # Step 2: Extract the image summary
-    summary_response: Iterator[RunResponse] = extract_ImageSummary_agent.run(recipe_text)
+    with image_summary_pool.agent() as agent:
+        summary_response: RunResponse = agent.run(recipe_text)
     image_summary = summary_response.content  
 
-    # Step 3: Generate the image
-    image_generator_agent.print_response(image_summary, stream=True)
-    images = image_generator_agent.get_images()
+    # Step 3: Generate the image; the Dalle tool adds it to this agent's run only
+    with image_generator_pool.agent() as agent:
+        image_response: RunResponse = agent.run(image_summary)
+    images = image_response.images
 
     # Return recipe text and image URL
+    image_url = None
     if images and isinstance(images, list):
         for image_response in images:
             image_url = image_response.url
@@ -85,7 +202,10 @@ def app():
             image_output = gr.Image(label="Generated Image")
 
         # Define the interaction
-        generate_button.click(fn=generate_recipe_and_image, inputs=[prompt], outputs=[recipe_output, image_output])
+        generate_button.click(
+            fn=generate_recipe_and_image, inputs=[prompt], outputs=[recipe_output, image_output],
+            concurrency_limit=CONCURRENCY,
+        )
     return demo
 
 # Run the app
@@ -0,0 +1,64 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class AgentPool:
+    """
+    Fixed-size pool of copies of a phi Agent, one borrowed per request.
+
+    Every copy is made from the template with Agent.deep_copy, so requests
+    never share memory, images or session state. When a request returns its
+    agent, the agent starts a new session (memory and session id are cleared)
+    and drops its images. Its run history therefore never holds more than one
+    request.
+
+    What is not request state is built once per copy and kept: the model's
+    SDK client, so its connections are reused, and the model's tool setup.
+    """
+
+    def __init__(self, template, size):
+        self.template = template
+        self.size = size
+        self._agents = queue.Queue()
+        self._lock = threading.Lock()
+        self.counters = {"borrowed": 0, "waited": 0}
+        for _ in range(size):
+            agent = template.deep_copy()
+            if agent.model is not None and agent.model.client is None:
+                # phi's Groq and OpenAIChat build a new SDK client, with its own
+                # connection pool, on every call unless one is set
+                agent.model.client = agent.model.get_client()
+            self._agents.put(agent)
+
+    @staticmethod
+    def reset(agent):
+        # new_session() clears model.functions but not model.tools, so the next
+        # run would process every tool again and append it to model.tools a
+        # second time. The functions are put back to keep the setup from the first run.
+        functions = agent.model.functions if agent.model is not None else None
+        agent.new_session()
+        if functions is not None:
+            agent.model.functions = functions
+        agent.images = None
+        agent.run_response = None
+
+    @contextmanager
+    def agent(self):
+        try:
+            agent = self._agents.get_nowait()
+        except queue.Empty:
+            agent = self._agents.get()
+            with self._lock:
+                self.counters["waited"] += 1
+        with self._lock:
+            self.counters["borrowed"] += 1
+        try:
+            yield agent
+        finally:
+            self.reset(agent)
+            self._agents.put(agent)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, size=self.size, available=self._agents.qsize())
@@ -0,0 +1,163 @@
+"""
+Per-request latency of the three-agent pipeline vs the fast path, against local stubs.
+
+One local server stands in for Groq (chat completions, JSON mode when asked)
+and for OpenAI. The OpenAI side covers gpt-4o chat (plain or streamed),
+which calls the create_image tool and then answers, and DALL·E image
+generation. Each call
+sleeps for a configurable model latency. The app is imported with
+GROQ_BASE_URL and OPENAI_BASE_URL pointing at the stub, so both paths run the
+real phi agents and SDK clients.
+
+Usage:
+    python bench_fast_path.py --requests 10 --llm-latency 0.8 --image-latency 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECIPE = "## Spaghetti Aglio e Olio\n\n**Cuisine:** Italian\n\n1. Boil the pasta.\n2. Fry the garlic."
+SUMMARY = "A plate of spaghetti glistening with olive oil, golden garlic and parsley."
+
+
+class StubBackends:
+    def __init__(self, llm_latency, image_latency):
+        self.llm_latency = llm_latency
+        self.image_latency = image_latency
+        self.calls = {"groq": 0, "gpt-4o": 0, "images": 0}
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path.endswith("/images/generations"):
+                    stub.calls["images"] += 1
+                    time.sleep(stub.image_latency)
+                    payload = {"created": int(time.time()), "data": [{"url": "https://stub/image.png", "revised_prompt": body["prompt"]}]}
+                elif self.path.startswith("/groq/"):
+                    stub.calls["groq"] += 1
+                    time.sleep(stub.llm_latency)
+                    if (body.get("response_format") or {}).get("type") == "json_object":
+                        payload = stub.chat({"content": json.dumps({"recipe": RECIPE, "image_summary": SUMMARY})})
+                    else:
+                        payload = stub.chat({"content": RECIPE})
+                else:
+                    stub.calls["gpt-4o"] += 1
+                    time.sleep(stub.llm_latency)
+                    if any(message.get("role") == "tool" for message in body["messages"]):
+                        payload = stub.chat({"content": "Here is the image of your dish."})
+                    else:
+                        payload = stub.chat({"content": None, "tool_calls": [{
+                            "id": "call_stub",
+                            "type": "function",
+                            "function": {"name": "create_image", "arguments": json.dumps({"prompt": SUMMARY})},
+                        }]}, finish_reason="tool_calls")
+                if body.get("stream"):
+                    self.send_stream(payload)
+                    return
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_stream(self, payload):
+                # print_response(stream=True) asks for server-sent events: the
+                # whole message goes out as one delta, then the finish chunk.
+                # Chunked rather than Connection: close, so a client that reads to
+                # the end can reuse the connection.
+                choice = payload["choices"][0]
+                delta = {key: value for key, value in choice["message"].items() if value is not None}
+                for tool_call in delta.get("tool_calls", []):
+                    tool_call["index"] = 0
+                chunks = [
+                    {"choices": [{"index": 0, "delta": delta, "finish_reason": None}]},
+                    {"choices": [{"index": 0, "delta": {}, "finish_reason": choice["finish_reason"]}]},
+                ]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = []
+                for chunk in chunks:
+                    chunk.update({"id": payload["id"], "object": "chat.completion.chunk", "created": payload["created"], "model": "stub"})
+                    events.append(f"data: {json.dumps(chunk)}\n\n".encode())
+                events.append(b"data: [DONE]\n\n")
+                for event in events:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.write(b"0\r\n\r\n")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        # One thread per client connection; the clients keep theirs alive
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def chat(message, finish_reason="stop"):
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "message": {"role": "assistant", **message}, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }
+
+
+def measure(name, fn, prompt, requests, stub):
+    calls = dict(stub.calls)
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        recipe, image_url = fn(prompt)
+        latencies.append(time.perf_counter() - start)
+        assert recipe and image_url, (recipe, image_url)
+    made = {key: (stub.calls[key] - calls[key]) / requests for key in calls}
+    print(
+        f"{name:>12}: p50 {statistics.median(latencies) * 1000:.0f} ms | max {max(latencies) * 1000:.0f} ms | "
+        f"calls/request: groq {made['groq']:.0f}, gpt-4o {made['gpt-4o']:.0f}, images {made['images']:.0f}"
+    )
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per chat completion")
+    parser.add_argument("--image-latency", type=float, default=1.5, help="seconds per DALL-E image")
+    args = parser.parse_args()
+
+    stub = StubBackends(args.llm_latency, args.image_latency)
+    os.environ.update({
+        "GROQ_BASE_URL": f"{stub.url}/groq",
+        "GROQ_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"{stub.url}/openai/v1",
+        "OPENAI_API_KEY": "stub",
+    })
+    import RecipeWizard
+
+    prompt = "Spaghetti with garlic"
+    agents = measure("three agents", RecipeWizard.generate_recipe_and_image_agents, prompt, args.requests, stub)
+    fast = measure("fast path", RecipeWizard.generate_recipe_and_image_fast, prompt, args.requests, stub)
+    print(f"saving: {(agents - fast) * 1000:.0f} ms per request ({agents / fast:.2f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
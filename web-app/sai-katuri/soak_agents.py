@@ -0,0 +1,85 @@
+"""
+Soak test for the per-request agent pools: RSS must stay flat.
+
+Runs generate_recipe_and_image many times from concurrent threads against the
+zero-latency stub backends of bench_fast_path, and samples the process RSS
+every --every requests. Each request borrows clean agents, so memory held by
+agents does not grow with the number of requests served. The template agents
+are never run, so their history stays empty. Pooled agents keep their SDK
+clients, so the stub's connection count should stop growing after warm-up.
+
+Usage:
+    python soak_agents.py --requests 10000 --path fast
+    python soak_agents.py --requests 2000 --path agents
+"""
+import argparse
+import gc
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_fast_path import StubBackends
+
+
+def rss_mib():
+    # Current resident set size (Linux)
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--every", type=int, default=1000, help="sample RSS every N requests")
+    parser.add_argument("--path", choices=["fast", "agents"], default="fast")
+    parser.add_argument("--max-growth", type=float, default=20.0, help="allowed RSS growth in MiB after warm-up")
+    args = parser.parse_args()
+
+    stub = StubBackends(0.0, 0.0)
+    os.environ.update({
+        "GROQ_BASE_URL": f"{stub.url}/groq",
+        "GROQ_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"{stub.url}/openai/v1",
+        "OPENAI_API_KEY": "stub",
+    })
+    import RecipeWizard
+
+    generate = {
+        "fast": RecipeWizard.generate_recipe_and_image_fast,
+        "agents": RecipeWizard.generate_recipe_and_image_agents,
+    }[args.path]
+
+    samples = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=RecipeWizard.CONCURRENCY) as pool:
+        for done in range(0, args.requests, args.every):
+            batch = min(args.every, args.requests - done)
+            for recipe, image_url in pool.map(lambda _: generate("Spaghetti with garlic"), range(batch)):
+                assert recipe and image_url
+            gc.collect()
+            samples.append(rss_mib())
+            print(
+                f"{done + batch:>6} requests | RSS {samples[-1]:.1f} MiB | "
+                f"{stub.connections} connections | {time.perf_counter() - start:.0f} s"
+            )
+
+    pools = {
+        name: getattr(RecipeWizard, name)
+        for name in ("recipe_generator_pool", "image_summary_pool", "image_generator_pool", "fast_recipe_pool")
+    }
+    for name, agent_pool in pools.items():
+        for agent in list(agent_pool._agents.queue):
+            assert not agent.memory.runs and not agent.images, f"an agent in {name} kept request state"
+            assert len(agent.model.tools or []) == len(agent.model.functions or {}), f"an agent in {name} repeated its tools"
+        print(f"{name}: {agent_pool.stats()}")
+
+    # The first sample includes import and warm-up allocations
+    growth = samples[-1] - samples[0]
+    print(f"RSS growth after the first {args.every} requests: {growth:+.1f} MiB")
+    assert growth <= args.max_growth, f"RSS grew by {growth:.1f} MiB"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()